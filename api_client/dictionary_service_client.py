@@ -1,6 +1,7 @@
 import requests
 import urllib.parse
 from api_client.security import Session
+from api_client.transfer_compression import read_json
 
 
 class DictionaryServiceClient(object):
@@ -20,10 +21,11 @@ class DictionaryServiceClient(object):
         response = requests.post(
             url,
             params=params,
-            headers=self.session.get_auth_header(),
-            proxies=self.session.proxies)
+            headers=self.session.get_request_headers(),
+            proxies=self.session.proxies,
+            stream=True)
         response.raise_for_status()
 
-        job_info = response.json()
+        job_info = read_json(response, self.session.transfer_statistics)
         result = job_info['jobId']
         return result
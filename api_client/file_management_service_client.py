@@ -1,6 +1,9 @@
 import requests
+import os
 import urllib.parse
 from api_client.security import Session
+from api_client.transfer_compression import count_upload_file, prepare_upload_file, read_content, read_json, \
+    write_content
 
 
 class FileManagementServiceClient(object):
@@ -11,48 +14,69 @@ class FileManagementServiceClient(object):
     def import_file(self, source_file_path, file_management_file_name, file_management_file_path):
         url_path = "/fms/v1/files/job/import"
         url = urllib.parse.urljoin(self.service_base_url, url_path)
-        files = {file_management_file_name: open(source_file_path, 'rb')}
-
-        upload_data = {'path': file_management_file_path}
-        response = requests.post(
-            url,
-            data=upload_data,
-            files=files,
-            headers=self.session.get_auth_header(),
-            proxies=self.session.proxies)
-        response.raise_for_status()
-
-        result = response.json()
+
+        if self.session.transfer_compression:
+            upload_file_path, is_temporary_upload_file = \
+                prepare_upload_file(source_file_path, self.session.transfer_statistics)
+        else:
+            upload_file_path, is_temporary_upload_file = \
+                count_upload_file(source_file_path, self.session.transfer_statistics)
+
+        try:
+            with open(upload_file_path, 'rb') as upload_file:
+                # The uploaded file keeps the name of the source file, even if it has been recompressed
+                files = {file_management_file_name: (os.path.basename(source_file_path), upload_file)}
+
+                upload_data = {'path': file_management_file_path}
+                response = requests.post(
+                    url,
+                    data=upload_data,
+                    files=files,
+                    headers=self.session.get_request_headers(),
+                    proxies=self.session.proxies,
+                    stream=True)
+                response.raise_for_status()
+        finally:
+            if is_temporary_upload_file:
+                os.remove(upload_file_path)
+
+        result = read_json(response, self.session.transfer_statistics)
         return result
 
     def download_job_import_error_file(self, job_id, destination_file_path):
-        file_content = self.retrieve_job_import_error_file_content(job_id)
-
-        with open(destination_file_path, 'wb') as local_destination_file:
-            local_destination_file.write(file_content)
+        response = self.request_job_import_error_file(job_id)
+        write_content(response, destination_file_path, self.session.transfer_statistics)
 
     def retrieve_job_import_error_file_content(self, job_id):
+        response = self.request_job_import_error_file(job_id)
+
+        result = read_content(response, self.session.transfer_statistics)
+        return result
+
+    def request_job_import_error_file(self, job_id):
         url_path = f'/fms/v1/files/job/import/{job_id}'
         url = urllib.parse.urljoin(self.service_base_url, url_path)
 
-        response = requests.get(url, headers=self.session.get_auth_header(), proxies=self.session.proxies)
-        response.raise_for_status()
-
-        result = response.content
+        result = requests.get(
+            url, headers=self.session.get_request_headers(), proxies=self.session.proxies, stream=True)
+        result.raise_for_status()
         return result
 
     def download_analysis_result_file(self, analysis_id, destination_file_path):
-        file_content = self.retrieve_analysis_result_file_content(analysis_id)
-
-        with open(destination_file_path, 'wb') as local_destination_file:
-            local_destination_file.write(file_content)
+        response = self.request_analysis_result_file(analysis_id)
+        write_content(response, destination_file_path, self.session.transfer_statistics)
 
     def retrieve_analysis_result_file_content(self, analysis_id):
+        response = self.request_analysis_result_file(analysis_id)
+
+        result = read_content(response, self.session.transfer_statistics)
+        return result
+
+    def request_analysis_result_file(self, analysis_id):
         url_path = f'/fms/v1/files/job/analyses/{analysis_id}'
         url = urllib.parse.urljoin(self.service_base_url, url_path)
 
-        response = requests.get(url, headers=self.session.get_auth_header(), proxies=self.session.proxies)
-        response.raise_for_status()
-
-        result = response.content
+        result = requests.get(
+            url, headers=self.session.get_request_headers(), proxies=self.session.proxies, stream=True)
+        result.raise_for_status()
         return result
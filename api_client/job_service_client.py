@@ -1,6 +1,7 @@
 import requests
 import urllib.parse
 from api_client.security import Session
+from api_client.transfer_compression import read_json
 
 
 class JobServiceClient(object):
@@ -11,8 +12,9 @@ class JobServiceClient(object):
     def get_job(self, job_id):
         url_path = f'/job/v1/jobs/{job_id}'
         url = urllib.parse.urljoin(self.service_base_url, url_path)
-        response = requests.get(url, headers=self.session.get_auth_header(), proxies=self.session.proxies)
+        response = requests.get(
+            url, headers=self.session.get_request_headers(), proxies=self.session.proxies, stream=True)
         response.raise_for_status()
 
-        jobs_status = response.json()
+        jobs_status = read_json(response, self.session.transfer_statistics)
         return jobs_status
@@ -1,6 +1,7 @@
 import requests
 import urllib.parse
 from api_client.security import Session
+from api_client.transfer_compression import read_json
 
 
 class ProjectServiceClient(object):
@@ -12,9 +13,10 @@ class ProjectServiceClient(object):
         url_path = f'/project/v1/analyses/{analysis_id}/jobs'
         url = urllib.parse.urljoin(self.service_base_url, url_path)
 
-        response = requests.post(url, headers=self.session.get_auth_header(), proxies=self.session.proxies)
+        response = requests.post(
+            url, headers=self.session.get_request_headers(), proxies=self.session.proxies, stream=True)
         response.raise_for_status()
 
-        job_info = response.json()
+        job_info = read_json(response, self.session.transfer_statistics)
         result = job_info['jobId']
         return result
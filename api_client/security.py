@@ -3,7 +3,9 @@ import urllib.parse
 import datetime
 import jwt
 import time
+import threading
 import logging
+from api_client.transfer_compression import TransferStatistics, ACCEPT_ENCODING
 
 
 SSO_SVCS_BASE_URL = "https://sso.moodysanalytics.com"
@@ -15,17 +17,23 @@ class AuthenticationError(Exception):
 
 
 class Session(object):
-    def __init__(self, user_id: str, user_password: str, sso_svcs_base_url: str = SSO_SVCS_BASE_URL, proxies={}):
+    def __init__(self, user_id: str, user_password: str, sso_svcs_base_url: str = SSO_SVCS_BASE_URL, proxies={},
+                 transfer_compression=False):
         self.sso_svcs_base_url = sso_svcs_base_url
         self.user_id = user_id
         self.user_password = user_password
         self.proxies = proxies
+        self.transfer_compression = transfer_compression
+        self.transfer_statistics = TransferStatistics()
 
         self.auth_token = None
         self.auth_token_claimset = None
         self.expiration_timestamp = None
         self.expiration_datetime = None
 
+        # Clients may share the session between threads, e.g. for concurrent downloads
+        self.auth_token_lock = threading.Lock()
+
     def __enter__(self):
         self.get_auth_token()
         logging.info(f"Security token has been generated.")
@@ -36,6 +44,11 @@ class Session(object):
         self.close()
 
     def get_auth_token(self):
+        with self.auth_token_lock:
+            result = self.get_or_renew_auth_token()
+            return result
+
+    def get_or_renew_auth_token(self):
         # Get authentication token for the first time
         if self.auth_token is None:
             self.auth_token = self.request_new_auth_token()
@@ -150,6 +163,12 @@ class Session(object):
         result = Session.create_auth_header(auth_token)
         return result
 
+    def get_request_headers(self):
+        result = self.get_auth_header()
+        if self.transfer_compression:
+            result['Accept-Encoding'] = ACCEPT_ENCODING
+        return result
+
     @staticmethod
     def get_current_date_time():
         result = datetime.datetime.now()
@@ -0,0 +1,312 @@
+import json
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+import logging
+from requests.exceptions import ContentDecodingError
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Responses are read undecoded from the connection, so the bytes on the wire can be counted, and decoded here.
+# zstd is requested only if zstandard is installed.
+ACCEPT_ENCODING = 'gzip, deflate, zstd' if zstandard is not None else 'gzip, deflate'
+CHUNK_SIZE = 1024 * 1024
+
+# ZIP files with compressed size above this share of the uncompressed size are recompressed before upload
+WEAK_COMPRESSION_RATIO = 0.5
+RECOMPRESSION_LEVEL = 9
+ZIP64_EXTRA_HEADER_ID = 0x0001
+
+
+class TransferStatistics(object):
+    """
+    Byte and CPU counters of the transfers of a session. They show whether transfer compression pays off.
+    CPU time is measured per thread, so concurrent transfers are not counted twice.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.responses_count = 0
+        self.wire_bytes_received = 0
+        self.decoded_bytes_received = 0
+        self.decode_cpu_time = 0.0
+        self.json_parse_cpu_time = 0.0
+        self.bytes_sent = 0
+        self.original_bytes_to_send = 0
+        self.recompression_cpu_time = 0.0
+
+    def add_response(self, wire_bytes, decoded_bytes, decode_cpu_time):
+        with self.lock:
+            self.responses_count += 1
+            self.wire_bytes_received += wire_bytes
+            self.decoded_bytes_received += decoded_bytes
+            self.decode_cpu_time += decode_cpu_time
+
+    def add_json_parse(self, json_parse_cpu_time):
+        with self.lock:
+            self.json_parse_cpu_time += json_parse_cpu_time
+
+    def add_upload(self, original_bytes, sent_bytes, recompression_cpu_time):
+        with self.lock:
+            self.original_bytes_to_send += original_bytes
+            self.bytes_sent += sent_bytes
+            self.recompression_cpu_time += recompression_cpu_time
+
+    def log_summary(self):
+        logging.info(
+            f"Transfer statistics: {self.responses_count} responses; "
+            f"received {self.wire_bytes_received} bytes on the wire, {self.decoded_bytes_received} bytes decoded; "
+            f"decoding CPU time {self.decode_cpu_time:.3f}s; "
+            f"JSON parsing CPU time {self.json_parse_cpu_time:.3f}s; "
+            f"sent {self.bytes_sent} bytes of {self.original_bytes_to_send} bytes of input files; "
+            f"recompression CPU time {self.recompression_cpu_time:.3f}s.")
+
+
+class ContentDecoder(object):
+    """
+    Incremental decoder of a response body by its Content-Encoding header.
+    Several encodings are decoded in the reverse order they were applied.
+    """
+    def __init__(self, content_encoding):
+        encodings = [encoding.strip().lower() for encoding in (content_encoding or '').split(',')]
+        self.decompressors = [ContentDecoder.create_decompressor(encoding)
+                              for encoding in reversed(encodings) if encoding not in ('', 'identity')]
+
+    def decompress(self, data):
+        try:
+            for decompressor in self.decompressors:
+                data = decompressor.decompress(data)
+        except (zlib.error, ValueError) as e:
+            raise ContentDecodingError(f'Response body cannot be decoded: {e}')
+        return data
+
+    def flush(self):
+        data = b''
+        try:
+            for decompressor in self.decompressors:
+                data = decompressor.decompress(data)
+                if hasattr(decompressor, 'flush'):
+                    data += decompressor.flush()
+        except (zlib.error, ValueError) as e:
+            raise ContentDecodingError(f'Response body cannot be decoded: {e}')
+        return data
+
+    @staticmethod
+    def create_decompressor(encoding):
+        if encoding in ('gzip', 'x-gzip'):
+            return zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if encoding == 'deflate':
+            return DeflateDecompressor()
+        if encoding == 'zstd' and zstandard is not None:
+            return zstandard.ZstdDecompressor().decompressobj()
+        raise ContentDecodingError(f"Response Content-Encoding '{encoding}' is not supported.")
+
+
+class DeflateDecompressor(object):
+    """
+    Decompressor of the deflate Content-Encoding. Servers send it either zlib wrapped or raw, as browsers accept both.
+    """
+    def __init__(self):
+        self.decompressor = zlib.decompressobj()
+        self.is_first_chunk = True
+
+    def decompress(self, data):
+        if not self.is_first_chunk or len(data) == 0:
+            return self.decompressor.decompress(data)
+
+        self.is_first_chunk = False
+        try:
+            return self.decompressor.decompress(data)
+        except zlib.error:
+            self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self.decompressor.decompress(data)
+
+    def flush(self):
+        return self.decompressor.flush()
+
+
+def iter_content(response, transfer_statistics):
+    """
+    Streams the undecoded response body from the connection and decodes it chunk by chunk.
+    The bytes on the wire, the decoded bytes and the decoding CPU time are added to the transfer statistics
+    when the body has been read.
+    :param response: Response of a request sent with stream=True
+    :param transfer_statistics: Transfer statistics of the session
+    :return: Generator of decoded chunks
+    """
+    decoder = ContentDecoder(response.headers.get('Content-Encoding'))
+    wire_bytes = 0
+    decoded_bytes = 0
+    cpu_time = 0.0
+
+    try:
+        for wire_chunk in response.raw.stream(CHUNK_SIZE, decode_content=False):
+            wire_bytes += len(wire_chunk)
+            cpu_time_begin = time.thread_time()
+            chunk = decoder.decompress(wire_chunk)
+            cpu_time += time.thread_time() - cpu_time_begin
+            if len(chunk) > 0:
+                decoded_bytes += len(chunk)
+                yield chunk
+
+        cpu_time_begin = time.thread_time()
+        chunk = decoder.flush()
+        cpu_time += time.thread_time() - cpu_time_begin
+        if len(chunk) > 0:
+            decoded_bytes += len(chunk)
+            yield chunk
+    finally:
+        transfer_statistics.add_response(wire_bytes, decoded_bytes, cpu_time)
+
+
+def read_content(response, transfer_statistics):
+    """
+    Reads and decodes the whole response body
+    :param response: Response of a request sent with stream=True
+    :param transfer_statistics: Transfer statistics of the session
+    :return: Decoded response body
+    """
+    result = b''.join(iter_content(response, transfer_statistics))
+    return result
+
+
+def read_json(response, transfer_statistics):
+    """
+    Reads and parses the JSON response body. Parsing CPU time is counted apart from decoding CPU time.
+    :param response: Response of a request sent with stream=True
+    :param transfer_statistics: Transfer statistics of the session
+    :return: Parsed JSON
+    """
+    content = read_content(response, transfer_statistics)
+
+    cpu_time_begin = time.thread_time()
+    result = json.loads(content)
+    transfer_statistics.add_json_parse(time.thread_time() - cpu_time_begin)
+    return result
+
+
+def write_content(response, destination_file_path, transfer_statistics):
+    """
+    Streams the response body to a file, decoding it chunk by chunk
+    :param response: Response of a request sent with stream=True
+    :param destination_file_path: Destination file path (full name of the file)
+    :param transfer_statistics: Transfer statistics of the session
+    """
+    with open(destination_file_path, 'wb') as local_destination_file:
+        for chunk in iter_content(response, transfer_statistics):
+            local_destination_file.write(chunk)
+
+
+def is_weakly_compressed(zip_file_path, weak_compression_ratio=WEAK_COMPRESSION_RATIO):
+    """
+    Checks whether the members of a ZIP file are stored or weakly compressed
+    :param zip_file_path: ZIP file path
+    :param weak_compression_ratio: Compressed to uncompressed size ratio above which compression is weak
+    :return: True - the ZIP file is worth recompressing; False - otherwise
+    """
+    with zipfile.ZipFile(zip_file_path) as zip_file:
+        infos = zip_file.infolist()
+
+    file_size = sum(info.file_size for info in infos)
+    compress_size = sum(info.compress_size for info in infos)
+    if file_size == 0:
+        return False
+
+    result = compress_size / file_size > weak_compression_ratio
+    return result
+
+
+def strip_zip64_extra(extra):
+    """
+    Removes the ZIP64 field from the extra data of a ZIP member. The destination ZIP file adds its own one if needed.
+    :param extra: Extra data of the ZIP member
+    :return: Extra data without the ZIP64 field
+    """
+    result = b''
+    position = 0
+    while position + 4 <= len(extra):
+        header_id, data_size = struct.unpack('<HH', extra[position:position + 4])
+        if header_id != ZIP64_EXTRA_HEADER_ID:
+            result += extra[position:position + 4 + data_size]
+        position += 4 + data_size
+    return result
+
+
+def recompress_zip_file(source_zip_file_path, destination_zip_file_path, compress_level=RECOMPRESSION_LEVEL):
+    """
+    Rewrites a ZIP file with the maximum deflate compression, streaming member by member
+    :param source_zip_file_path: Source ZIP file path
+    :param destination_zip_file_path: Destination ZIP file path
+    :param compress_level: Deflate compression level
+    """
+    with zipfile.ZipFile(source_zip_file_path) as source_zip_file, \
+            zipfile.ZipFile(destination_zip_file_path, 'w', zipfile.ZIP_DEFLATED) as destination_zip_file:
+        for info in source_zip_file.infolist():
+            # The copied member info keeps the name, timestamp and attributes of the source member.
+            # Its file size lets the destination ZIP file switch to ZIP64 for members above 2 GiB.
+            destination_info = zipfile.ZipInfo(info.filename, info.date_time)
+            destination_info.comment = info.comment
+            destination_info.extra = strip_zip64_extra(info.extra)
+            destination_info.create_system = info.create_system
+            destination_info.internal_attr = info.internal_attr
+            destination_info.external_attr = info.external_attr
+            destination_info.file_size = info.file_size
+            destination_info.compress_type = zipfile.ZIP_DEFLATED
+            destination_info._compresslevel = compress_level
+
+            with source_zip_file.open(info) as source_member_file, \
+                    destination_zip_file.open(destination_info, 'w') as destination_member_file:
+                shutil.copyfileobj(source_member_file, destination_member_file, CHUNK_SIZE)
+
+
+def count_upload_file(source_file_path, transfer_statistics):
+    """
+    Counts a file which is uploaded as it is, so uploads can be compared between runs with and without
+    transfer compression
+    :param source_file_path: Source file path
+    :param transfer_statistics: Transfer statistics of the session
+    :return: Path of the file to upload, and False as it is not a temporary file
+    """
+    original_bytes = os.path.getsize(source_file_path)
+    transfer_statistics.add_upload(original_bytes, original_bytes, 0.0)
+    return source_file_path, False
+
+
+def prepare_upload_file(source_file_path, transfer_statistics):
+    """
+    Recompresses a weakly compressed ZIP file into a temporary file before upload.
+    Other files and well compressed ZIP files are uploaded as they are.
+    :param source_file_path: Source file path
+    :param transfer_statistics: Transfer statistics of the session
+    :return: Path of the file to upload, and True if it is a temporary file which must be deleted after upload
+    """
+    if not zipfile.is_zipfile(source_file_path) or not is_weakly_compressed(source_file_path):
+        result = count_upload_file(source_file_path, transfer_statistics)
+        return result
+
+    original_bytes = os.path.getsize(source_file_path)
+
+    cpu_time_begin = time.thread_time()
+    file_descriptor, recompressed_file_path = tempfile.mkstemp(suffix='.zip')
+    os.close(file_descriptor)
+    recompress_zip_file(source_file_path, recompressed_file_path)
+    recompression_cpu_time = time.thread_time() - cpu_time_begin
+
+    recompressed_bytes = os.path.getsize(recompressed_file_path)
+    if recompressed_bytes >= original_bytes:
+        os.remove(recompressed_file_path)
+        transfer_statistics.add_upload(original_bytes, original_bytes, recompression_cpu_time)
+        return source_file_path, False
+
+    logging.info(
+        f"Input file '{source_file_path}' has been recompressed from {original_bytes} to {recompressed_bytes} bytes.")
+    transfer_statistics.add_upload(original_bytes, recompressed_bytes, recompression_cpu_time)
+    return recompressed_file_path, True
@@ -0,0 +1,426 @@
+from collections import deque
+import argparse
+import bisect
+import heapq
+import itertools
+import math
+import random
+import logging
+
+
+# Configure the logger
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(levelname)s\t%(asctime)s\t%(filename)s\t%(message)s',
+    datefmt="%Y-%m-%d %H:%M:%S"
+)
+
+
+SERVICES = ['sso', 'file_management', 'dictionary', 'project', 'job']
+AUTH_TOKEN_RENEWAL_THRESHOLD_IN_SECONDS = 30
+AUTH_TOKEN_REVOCATION_DELAY_IN_SECONDS = 1
+REQUEST_RATE_WINDOW_IN_SECONDS = 60
+
+# Synthetic workflow model. Every distribution can be replaced by recorded samples, see load_workflow_model().
+DEFAULT_WORKFLOW_MODEL = {
+    'request_latency_seconds': {'lognormal': {'median': 0.3, 'sigma': 0.5}},
+    'input_file_size_bytes': {'lognormal': {'median': 20 * 1024 * 1024, 'sigma': 0.8}},
+    'result_file_size_bytes': {'lognormal': {'median': 50 * 1024 * 1024, 'sigma': 0.8}},
+    'error_file_size_bytes': {'constant': 64 * 1024},
+    'dictionary_import_job_seconds': {'lognormal': {'median': 120, 'sigma': 0.6}},
+    'analysis_job_seconds': {'lognormal': {'median': 1800, 'sigma': 0.7}},
+    'dictionary_import_failure_rate': 0.02,
+    'analysis_failure_rate': 0.05,
+    'upload_bandwidth_bytes_per_second': 10 * 1024 * 1024,
+    'download_bandwidth_bytes_per_second': 20 * 1024 * 1024,
+    'auth_token_lifetime_seconds': 3600,
+    'server_job_slots': 0,
+    'client_base_memory_bytes': 60 * 1024 * 1024,
+    'workflow_memory_bytes': 2 * 1024 * 1024,
+    # requests builds the whole multipart upload body in memory; downloads are streamed in chunks
+    'upload_memory_factor': 1.0,
+    'download_chunk_bytes': 1024 * 1024
+}
+
+
+class ConstantDistribution(object):
+    def __init__(self, value):
+        self.value = value
+
+    def sample(self, rng):
+        return self.value
+
+
+class LogNormalDistribution(object):
+    def __init__(self, median, sigma):
+        self.mu = math.log(median)
+        self.sigma = sigma
+
+    def sample(self, rng):
+        return rng.lognormvariate(self.mu, self.sigma)
+
+
+class EmpiricalDistribution(object):
+    """
+    Distribution of recorded samples, e.g. stage wall times from the profiling summaries of real runs
+    """
+    def __init__(self, samples):
+        if len(samples) == 0:
+            raise SimulationError("Recorded distribution has no samples.")
+        self.samples = list(samples)
+
+    def sample(self, rng):
+        return rng.choice(self.samples)
+
+
+def create_distribution(distribution_config):
+    """
+    Creates a distribution from its configuration
+    :param distribution_config: {'constant': value}, {'lognormal': {'median': median, 'sigma': sigma}}
+    or {'samples': [recorded values]}
+    :return: Distribution
+    """
+    if 'constant' in distribution_config:
+        return ConstantDistribution(distribution_config['constant'])
+    if 'lognormal' in distribution_config:
+        return LogNormalDistribution(
+            distribution_config['lognormal']['median'], distribution_config['lognormal']['sigma'])
+    if 'samples' in distribution_config:
+        return EmpiricalDistribution(distribution_config['samples'])
+
+    raise SimulationError(f"Unknown distribution '{distribution_config}'.")
+
+
+class WorkflowModel(object):
+    def __init__(self, model_config=None):
+        config = dict(DEFAULT_WORKFLOW_MODEL)
+        config.update(model_config or {})
+
+        self.request_latency = create_distribution(config['request_latency_seconds'])
+        self.input_file_size = create_distribution(config['input_file_size_bytes'])
+        self.result_file_size = create_distribution(config['result_file_size_bytes'])
+        self.error_file_size = create_distribution(config['error_file_size_bytes'])
+        self.dictionary_import_job_duration = create_distribution(config['dictionary_import_job_seconds'])
+        self.analysis_job_duration = create_distribution(config['analysis_job_seconds'])
+        self.dictionary_import_failure_rate = config['dictionary_import_failure_rate']
+        self.analysis_failure_rate = config['analysis_failure_rate']
+        self.upload_bandwidth = config['upload_bandwidth_bytes_per_second']
+        self.download_bandwidth = config['download_bandwidth_bytes_per_second']
+        self.auth_token_lifetime = config['auth_token_lifetime_seconds']
+        self.server_job_slots = config['server_job_slots']
+        self.client_base_memory = config['client_base_memory_bytes']
+        self.workflow_memory = config['workflow_memory_bytes']
+        self.upload_memory_factor = config['upload_memory_factor']
+        self.download_chunk = config['download_chunk_bytes']
+
+
+class Resource(object):
+    def __init__(self, capacity):
+        # Capacity 0 means unlimited
+        self.capacity = capacity
+        self.in_use = 0
+        self.waiters = deque()
+
+
+class SimulationResult(object):
+    def __init__(self, concurrency, poll_interval):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.makespan = 0.0
+        self.request_times = {service: [] for service in SERVICES}
+        self.peak_memory = 0
+        self.succeeded_count = 0
+        self.failed_count = 0
+        self.workflow_durations = []
+
+    def requests_count(self, service):
+        return len(self.request_times[service])
+
+    def average_request_rate(self, service):
+        """
+        :return: Average number of requests per second to the service over the batch makespan
+        """
+        if self.makespan == 0:
+            return 0.0
+        result = len(self.request_times[service]) / self.makespan
+        return result
+
+    def peak_request_rate(self, service, window=REQUEST_RATE_WINDOW_IN_SECONDS):
+        """
+        :return: Maximum number of requests to the service in any window of the defined length
+        """
+        request_times = self.request_times[service]
+        result = 0
+        for index, request_time in enumerate(request_times):
+            window_end_index = bisect.bisect_right(request_times, request_time + window, lo=index)
+            result = max(result, window_end_index - index)
+        return result
+
+    def workflow_duration_percentile(self, percentile):
+        if len(self.workflow_durations) == 0:
+            return 0.0
+        durations = sorted(self.workflow_durations)
+        index = min(int(math.ceil(percentile / 100 * len(durations))) - 1, len(durations) - 1)
+        result = durations[max(index, 0)]
+        return result
+
+
+class Simulation(object):
+    """
+    Discrete-event simulation of a batch of analysis runs. Each analysis run replays the run_analytics steps:
+    authentication, upload, dictionary import job, job wait polling, run analysis, job wait polling and download.
+    Processes are generators which yield ('timeout', seconds), ('acquire', resource) or ('release', resource).
+    """
+    def __init__(self, model: WorkflowModel, concurrency, poll_interval, seed=0):
+        self.model = model
+        self.poll_interval = poll_interval
+        self.seed = seed
+
+        self.now = 0.0
+        self.events = []
+        self.sequence = itertools.count()
+
+        self.client_slots = Resource(concurrency)
+        self.server_job_slots = Resource(model.server_job_slots)
+        self.active_uploads = 0
+        self.active_downloads = 0
+        self.memory = model.client_base_memory
+
+        self.result = SimulationResult(concurrency, poll_interval)
+        self.result.peak_memory = self.memory
+
+    def run(self, batch_size):
+        """
+        Runs the simulation of a batch of analysis runs
+        :param batch_size: Number of analysis runs in the batch
+        :return: Simulation result
+        """
+        for index in range(batch_size):
+            self.start(self.run_analytics(index))
+
+        while len(self.events) > 0:
+            self.now, sequence, process, value = heapq.heappop(self.events)
+            self.step(process, value)
+
+        self.result.makespan = self.now
+        for request_times in self.result.request_times.values():
+            request_times.sort()
+        return self.result
+
+    def start(self, process, delay=0.0, value=None):
+        heapq.heappush(self.events, (self.now + delay, next(self.sequence), process, value))
+
+    def step(self, process, value):
+        while True:
+            try:
+                command, argument = process.send(value)
+            except StopIteration:
+                return
+            value = None
+
+            if command == 'timeout':
+                self.start(process, argument)
+                return
+            if command == 'acquire':
+                if argument.capacity == 0 or argument.in_use < argument.capacity:
+                    argument.in_use += 1
+                    continue
+                argument.waiters.append(process)
+                return
+            if command == 'release':
+                argument.in_use -= 1
+                if len(argument.waiters) > 0:
+                    argument.in_use += 1
+                    self.start(argument.waiters.popleft())
+                continue
+
+            raise SimulationError(f"Unknown simulation command '{command}'.")
+
+    def change_memory(self, delta):
+        self.memory += delta
+        self.result.peak_memory = max(self.result.peak_memory, self.memory)
+
+    def run_analytics(self, index):
+        yield 'acquire', self.client_slots
+        workflow_begin = self.now
+        self.change_memory(self.model.workflow_memory)
+        # Each analysis run has its own random numbers for the workload (sizes, job durations and failures),
+        # apart from request latencies, so different settings are compared on the same sampled workload
+        session = {
+            'token_expiration': 0.0,
+            'workload_rng': random.Random(f'{self.seed}-{index}-workload'),
+            'latency_rng': random.Random(f'{self.seed}-{index}-latency')
+        }
+
+        # Session.__enter__ requests the authentication token
+        yield from self.request_auth_token(session)
+        succeeded = yield from self.run_workflow_steps(session)
+        # Session.__exit__ revokes the authentication token
+        yield from self.request(session, 'sso')
+
+        self.change_memory(-self.model.workflow_memory)
+        self.result.workflow_durations.append(self.now - workflow_begin)
+        if succeeded:
+            self.result.succeeded_count += 1
+        else:
+            self.result.failed_count += 1
+        yield 'release', self.client_slots
+
+    def run_workflow_steps(self, session):
+        rng = session['workload_rng']
+
+        # Step 1: Upload ZIP file with inputs
+        input_file_size = self.model.input_file_size.sample(rng)
+        yield from self.upload(session, input_file_size)
+
+        # Step 2: Dictionary import job
+        yield from self.api_request(session, 'dictionary')
+        job_failed = yield from self.run_job(
+            session, self.model.dictionary_import_job_duration, self.model.dictionary_import_failure_rate)
+        if job_failed:
+            yield from self.download(session, 'file_management', self.model.error_file_size.sample(rng))
+            return False
+
+        # Step 3: Analysis calculation job
+        yield from self.api_request(session, 'project')
+        job_failed = yield from self.run_job(
+            session, self.model.analysis_job_duration, self.model.analysis_failure_rate)
+        if job_failed:
+            yield from self.download(session, 'file_management', self.model.error_file_size.sample(rng))
+            return False
+
+        # Step 4: Download results
+        yield from self.download(session, 'file_management', self.model.result_file_size.sample(rng))
+        return True
+
+    def run_job(self, session, job_duration, failure_rate):
+        job = {'finished': False}
+        job_failed = session['workload_rng'].random() < failure_rate
+        self.start(self.run_server_job(job, job_duration.sample(session['workload_rng'])))
+
+        # job_wait: poll the job service until the job is not running, sleeping between the calls
+        while True:
+            yield from self.api_request(session, 'job')
+            if job['finished']:
+                break
+            yield 'timeout', self.poll_interval
+
+        return job_failed
+
+    def run_server_job(self, job, duration):
+        yield 'acquire', self.server_job_slots
+        yield 'timeout', duration
+        job['finished'] = True
+        yield 'release', self.server_job_slots
+
+    def upload(self, session, size):
+        memory = size * self.model.upload_memory_factor
+        self.change_memory(memory)
+        self.active_uploads += 1
+        # The link bandwidth is shared equally by the uploads running when the upload starts
+        transfer_time = size * self.active_uploads / self.model.upload_bandwidth
+        yield from self.api_request(session, 'file_management', transfer_time)
+        self.active_uploads -= 1
+        self.change_memory(-memory)
+
+    def download(self, session, service, size):
+        memory = min(size, self.model.download_chunk)
+        self.change_memory(memory)
+        self.active_downloads += 1
+        # The link bandwidth is shared equally by the downloads running when the download starts
+        transfer_time = size * self.active_downloads / self.model.download_bandwidth
+        yield from self.api_request(session, service, transfer_time)
+        self.active_downloads -= 1
+        self.change_memory(-memory)
+
+    def api_request(self, session, service, transfer_time=0.0):
+        # Session.get_auth_header renews the token shortly before it expires
+        if self.now >= session['token_expiration'] - AUTH_TOKEN_RENEWAL_THRESHOLD_IN_SECONDS:
+            yield from self.request(session, 'sso')
+            yield 'timeout', AUTH_TOKEN_REVOCATION_DELAY_IN_SECONDS
+            yield from self.request_auth_token(session)
+
+        yield from self.request(session, service, transfer_time)
+
+    def request_auth_token(self, session):
+        yield from self.request(session, 'sso')
+        session['token_expiration'] = self.now + self.model.auth_token_lifetime
+
+    def request(self, session, service, transfer_time=0.0):
+        self.result.request_times[service].append(self.now)
+        yield 'timeout', self.model.request_latency.sample(session['latency_rng']) + transfer_time
+
+
+class SimulationError(Exception):
+    """
+    Capacity simulation error
+    """
+    pass
+
+
+def simulate_batch(model: WorkflowModel, batch_size, concurrency, poll_interval, seed=0):
+    """
+    Simulates a batch of analysis runs
+    :param model: Workflow model with distributions of durations, sizes and failure rates
+    :param batch_size: Number of analysis runs in the batch
+    :param concurrency: Number of analysis runs executed at the same time on the client side
+    :param poll_interval: Delay between job service calls in job_wait, in seconds
+    :param seed: Random seed. The same seed gives the same result.
+    :return: Simulation result
+    """
+    simulation = Simulation(model, concurrency, poll_interval, seed)
+    result = simulation.run(batch_size)
+    return result
+
+
+def load_workflow_model(model_file_path):
+    """
+    Loads a workflow model from a HOCON or JSON file. Items missing in the file keep their default values.
+    :param model_file_path: Model file path
+    :return: Workflow model
+    """
+    from pyhocon import ConfigFactory
+
+    model_config = ConfigFactory.parse_file(model_file_path).as_plain_ordered_dict()
+    result = WorkflowModel(model_config)
+    return result
+
+
+def log_simulation_result(result: SimulationResult):
+    logging.info(
+        f"concurrency: {result.concurrency}; poll interval: {result.poll_interval}s; "
+        f"makespan: {result.makespan / 3600:.2f}h; "
+        f"succeeded: {result.succeeded_count}; failed: {result.failed_count}; "
+        f"run p50/p95: {result.workflow_duration_percentile(50) / 60:.1f}/"
+        f"{result.workflow_duration_percentile(95) / 60:.1f}min; "
+        f"peak memory: {result.peak_memory / 1024 / 1024:.0f}MB")
+    for service in SERVICES:
+        logging.info(
+            f"    {service}: {result.requests_count(service)} requests; "
+            f"average {result.average_request_rate(service):.3f}/s; "
+            f"peak {result.peak_request_rate(service)}/{REQUEST_RATE_WINDOW_IN_SECONDS}s")
+
+
+# Command line arguments parser definitions
+args_parser = argparse.ArgumentParser()
+args_parser.add_argument('--batch_size', type=int, default=200, help='The number of analysis runs in the batch.')
+args_parser.add_argument(
+    '--concurrency', type=int, nargs='+', default=[1, 4, 8, 16],
+    help='The numbers of analysis runs executed at the same time to simulate.')
+args_parser.add_argument(
+    '--poll_interval', type=float, nargs='+', default=[10],
+    help='The delays between job service calls in seconds to simulate.')
+args_parser.add_argument('--model_file', help='The name of the workflow model file (HOCON or JSON).')
+args_parser.add_argument('--seed', type=int, default=0, help='The random seed.')
+
+# Command line interface for capacity simulation
+if __name__ == '__main__':
+    # Parse command line arguments
+    args = args_parser.parse_args()
+    arg_model = load_workflow_model(args.model_file) if args.model_file is not None else WorkflowModel()
+
+    # Simulate every combination of concurrency and poll interval
+    for arg_concurrency in args.concurrency:
+        for arg_poll_interval in args.poll_interval:
+            log_simulation_result(
+                simulate_batch(arg_model, args.batch_size, arg_concurrency, arg_poll_interval, args.seed))
@@ -0,0 +1,248 @@
+from concurrent.futures import ThreadPoolExecutor
+import csv
+import io
+import os
+import zipfile
+import logging
+
+
+DEFAULT_MAX_DOWNLOAD_WORKERS = 8
+JOB_FAILED_STATUSES = ['FAILED', 'COMPLETED_WITH_ERRORS']
+
+# Candidate column names of the job error files by error key, matched case-insensitively in this order.
+# The layout of the File Management Service error files is not documented, so the mapping can be overridden.
+DEFAULT_ERROR_FILE_COLUMN_MAPPING = {
+    'fileName': ['fileName', 'file', 'filename'],
+    'rowNumber': ['rowNumber', 'row', 'lineNumber', 'line'],
+    'columnName': ['columnName', 'column', 'field'],
+    'errorCode': ['errorCode', 'code'],
+    'errorMessage': ['errorMessage', 'message', 'error']
+}
+
+
+class ErrorIndex(object):
+    """
+    In-memory store of errors from the job error files, indexed by job id, file name, row number and error code.
+    Every error keeps all columns of its error file row in 'fields'.
+    """
+    def __init__(self, column_mapping=None):
+        self.column_mapping = column_mapping or DEFAULT_ERROR_FILE_COLUMN_MAPPING
+        self.errors = []
+        self.indexes = {
+            'jobId': {},
+            'fileName': {},
+            'rowNumber': {},
+            'errorCode': {}
+        }
+
+    def __len__(self):
+        return len(self.errors)
+
+    def add_error(self, error):
+        """
+        Adds a single error to the store
+        :param error: Dictionary with 'jobId', 'fileName', 'rowNumber', 'columnName', 'errorCode',
+        'errorMessage' and 'fields' keys
+        """
+        error_position = len(self.errors)
+        self.errors.append(error)
+        for key, index in self.indexes.items():
+            index.setdefault(error.get(key), []).append(error_position)
+
+    def add_error_file(self, job_id, error_file_path):
+        """
+        Stream-parses a job error file (ZIP with CSV files) and adds its errors to the store.
+        The errors are added only if the whole file has been parsed, so a broken file leaves the store unchanged.
+        :param job_id: Job id
+        :param error_file_path: Error file path (full name of the file)
+        :return: Number of added errors
+        """
+        errors = []
+        with zipfile.ZipFile(error_file_path) as error_zip_file:
+            for member_name in error_zip_file.namelist():
+                if not member_name.lower().endswith('.csv'):
+                    continue
+                with error_zip_file.open(member_name) as member_file:
+                    member_text_file = io.TextIOWrapper(member_file, encoding='utf-8-sig', newline='')
+                    reader = csv.DictReader(member_text_file, strict=True)
+                    columns = self.map_columns(error_file_path, member_name, reader.fieldnames or [])
+                    for row in reader:
+                        errors.append(ErrorIndex.create_error(job_id, member_name, row, columns))
+
+        for error in errors:
+            self.add_error(error)
+
+        result = len(errors)
+        return result
+
+    def query(self, job_id=None, file_name=None, row_number=None, error_code=None):
+        """
+        Finds errors by any combination of job id, file name, row number and error code
+        :return: List of errors in the order they were added
+        """
+        criteria = {
+            'jobId': job_id,
+            'fileName': file_name,
+            'rowNumber': row_number,
+            'errorCode': error_code
+        }
+
+        positions = None
+        for key, value in criteria.items():
+            if value is None:
+                continue
+            key_positions = self.indexes[key].get(value, [])
+            positions = set(key_positions) if positions is None else positions.intersection(key_positions)
+
+        if positions is None:
+            return list(self.errors)
+
+        result = [self.errors[position] for position in sorted(positions)]
+        return result
+
+    def count_by(self, key):
+        """
+        Counts errors by one of the indexed keys
+        :param key: 'jobId', 'fileName', 'rowNumber' or 'errorCode'
+        :return: Dictionary of error counts by key value
+        """
+        result = {value: len(positions) for value, positions in self.indexes[key].items()}
+        return result
+
+    def map_columns(self, error_file_path, member_name, header):
+        """
+        Finds the columns of an error file which hold the error keys
+        :param error_file_path: Error file path
+        :param member_name: Name of the CSV file inside of the error file
+        :param header: Column names of the CSV file
+        :return: Dictionary of column names by error key. Keys without a matching column are missing.
+        """
+        header_by_lower_name = {column_name.lower(): column_name for column_name in header}
+
+        result = {}
+        for key, candidate_column_names in self.column_mapping.items():
+            for candidate_column_name in candidate_column_names:
+                if candidate_column_name.lower() in header_by_lower_name:
+                    result[key] = header_by_lower_name[candidate_column_name.lower()]
+                    break
+
+        missing_keys = [key for key in self.column_mapping if key not in result]
+        if len(missing_keys) > 0:
+            logging.warning(
+                f"Error file '{error_file_path}' ('{member_name}') has no columns for {missing_keys}. "
+                f"Its columns are {header}. These errors are kept in 'fields' but are not indexed by the missing keys.")
+
+        return result
+
+    @staticmethod
+    def create_error(job_id, member_name, row, columns):
+        result = {key: row.get(column_name) for key, column_name in columns.items()}
+        for key in DEFAULT_ERROR_FILE_COLUMN_MAPPING:
+            result.setdefault(key, None)
+        result['jobId'] = job_id
+        result['fields'] = dict(row)
+
+        # Error files without a file name column are named after the input file
+        if result['fileName'] is None:
+            result['fileName'] = member_name
+
+        if result['rowNumber'] is not None and result['rowNumber'].isdigit():
+            result['rowNumber'] = int(result['rowNumber'])
+
+        return result
+
+
+def download_error_files(fms_client, failed_jobs, error_files_dir, max_workers=DEFAULT_MAX_DOWNLOAD_WORKERS):
+    """
+    Downloads error files of the failed jobs concurrently
+    :param fms_client: File management service client for downloading error files
+    :param failed_jobs: Dictionary of the final job statuses by job id
+    :param error_files_dir: Destination directory for error files on the client side
+    :param max_workers: Maximum number of concurrent downloads
+    :return: Dictionary of destination error file paths by job id, and dictionary of download errors by job id
+    """
+    def download(job_id, job_final_status):
+        destination_error_file_name = f"job_{job_final_status['type']}_{job_id}_errors.zip"
+        destination_error_file_path = os.path.join(error_files_dir, destination_error_file_name)
+        fms_client.download_job_import_error_file(job_id, destination_error_file_path)
+        return destination_error_file_path
+
+    error_file_paths = {}
+    download_errors = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {job_id: executor.submit(download, job_id, job_final_status)
+                   for job_id, job_final_status in failed_jobs.items()}
+        for job_id, future in futures.items():
+            try:
+                error_file_paths[job_id] = future.result()
+            except Exception as e:
+                download_errors[job_id] = e
+                logging.info(f"Downloading error file of the job (job id: '{job_id}') has failed: '{e}'.")
+
+    return error_file_paths, download_errors
+
+
+def create_error_index(fms_client, failed_jobs, error_files_dir, max_workers=DEFAULT_MAX_DOWNLOAD_WORKERS):
+    """
+    Downloads error files of the failed jobs concurrently and parses them into one error index
+    :param fms_client: File management service client for downloading error files
+    :param failed_jobs: Dictionary of the final job statuses by job id
+    :param error_files_dir: Destination directory for error files on the client side
+    :param max_workers: Maximum number of concurrent downloads
+    :return: Error index, dictionary of error file paths by job id, dictionary of download errors by job id
+    and dictionary of parse errors by job id of the error files which have been downloaded but cannot be parsed
+    """
+    error_file_paths, download_errors = download_error_files(fms_client, failed_jobs, error_files_dir, max_workers)
+
+    result = ErrorIndex()
+    parse_errors = {}
+    for job_id, error_file_path in error_file_paths.items():
+        try:
+            result.add_error_file(job_id, error_file_path)
+        except (zipfile.BadZipFile, csv.Error, UnicodeDecodeError) as e:
+            parse_errors[job_id] = e
+            logging.info(f"Error file '{error_file_path}' of the job (job id: '{job_id}') cannot be parsed: '{e}'.")
+
+    return result, error_file_paths, download_errors, parse_errors
+
+
+def is_job_failed(job_status):
+    """
+    Check job status on failure
+    :param job_status: Job status to verify
+    :return: True - job has failed; False - job has finished successfully
+    """
+    if job_status['status'] in JOB_FAILED_STATUSES:
+        return True
+    return False
+
+
+def validate_jobs(job_final_statuses, fms_client, error_files_dir, max_workers=DEFAULT_MAX_DOWNLOAD_WORKERS):
+    """
+    Validates a batch of jobs for failed statuses. Error files of all failed jobs are downloaded concurrently
+    and indexed, so the failures of the whole batch can be triaged in one pass.
+    :param job_final_statuses: Dictionary of the final job statuses by job id
+    :param fms_client: File management service client for downloading error files
+    :param error_files_dir: Destination directory for error files on the client side
+    :param max_workers: Maximum number of concurrent downloads
+    :return: Error index, dictionary of error file paths by job id, dictionary of download errors by job id
+    and dictionary of parse errors by job id. All of them are empty if no job has failed.
+    """
+    failed_jobs = {job_id: job_final_status for job_id, job_final_status in job_final_statuses.items()
+                   if is_job_failed(job_final_status)}
+    error_index, error_file_paths, download_errors, parse_errors = \
+        create_error_index(fms_client, failed_jobs, error_files_dir, max_workers)
+
+    for job_id, job_final_status in failed_jobs.items():
+        logging.info(
+            f"The job 'job type: {job_final_status['type']}; job id: {job_id}' "
+            f"stopped by error with status '{job_final_status['status']}'. "
+            f"Errors found: {len(error_index.query(job_id=job_id))}.")
+    for error_code, errors_count in error_index.count_by('errorCode').items():
+        logging.info(f"Error code '{error_code}': {errors_count} errors.")
+    if len(download_errors) > 0:
+        logging.info(f"Error files of {len(download_errors)} failed jobs have not been retrieved.")
+    if len(parse_errors) > 0:
+        logging.info(f"Error files of {len(parse_errors)} failed jobs cannot be parsed.")
+
+    return error_index, error_file_paths, download_errors, parse_errors
@@ -4,6 +4,9 @@ from api_client.file_management_service_client import FileManagementServiceClien
 from api_client.dictionary_service_client import DictionaryServiceClient
 from api_client.job_service_client import JobServiceClient
 from api_client.project_service_client import ProjectServiceClient
+from input_file_validation import validate_input_zip_file, write_error_file
+from error_report import is_job_failed, validate_jobs
+from profiler import Profiler, profile_stage
 from datetime import datetime
 from datetime import timedelta
 import time
@@ -52,9 +55,10 @@ USER_ID = analytics_run_config['user_id']
 USER_PASSWORD = analytics_run_config['user_password']
 DEFAULT_JOB_WAIT_TIMEOUT = timedelta(minutes=analytics_run_config['default_job_wait_timeout_in_minutes'])
 PROXIES = get_proxies(analytics_run_config)
+TRANSFER_COMPRESSION = analytics_run_config.get_bool('transfer_compression', False)
 
 
-def run_analytics(analysis_id, input_zip_file_path, result_files_dir, error_files_dir):
+def run_analytics(analysis_id, input_zip_file_path, result_files_dir, error_files_dir, validate_input=True):
     """
     Runs analysis workflow
     :param analysis_id: Analysis id.
@@ -62,60 +66,97 @@ def run_analytics(analysis_id, input_zip_file_path, result_files_dir, error_file
     :param result_files_dir: Output directory for results
     :param error_files_dir: Output directory for errors of the failed analysis runs or with errors.
     It can be the same as result_files_dir
+    :param validate_input: True - validate the input file on the client side before it is uploaded
     """
     logging.info(f"Analysis run (analysis id: '{analysis_id}') has started.")
     try:
+        # Step 0: Validate the input file locally, so malformed inputs are rejected before upload
+        if validate_input:
+            with profile_stage('validate_input'):
+                validate_input_file(input_zip_file_path, error_files_dir)
+
         # Run analysis workflow in the scope of the same authentication session
-        with Session(USER_ID, USER_PASSWORD, SSO_SERVICE_BASE_URL, PROXIES) as session:
-            # Step 1: Upload ZIP file with inputs to the system's raw files location
-            logging.info(f"Importing of the input file '{input_zip_file_path}' to the system has started.")
-            fms_client = FileManagementServiceClient(session, DATA_API_BASE_URL)
-            head, file_management_file_name = os.path.split(input_zip_file_path)
-            files_info = fms_client.import_file(input_zip_file_path, file_management_file_name, 'raw')
-            logging.info(f"Importing of the input file '{input_zip_file_path}' to the system has finished.")
-
-            # Step 2.1: Schedule a job to move files from raw files location to processing location
-            file_info = files_info[0]
-            ds_client = DictionaryServiceClient(session, DATA_API_BASE_URL)
-            job_id = ds_client.import_file(file_info['id'], 'FileUpload', True)
-            logging.info(
-                f"Moving input file '{file_info['filename']}' from raw files location "
-                f"to the processing location has started (job id: '{job_id}').")
-
-            # Step 2.2: Wait until file moving is done
-            job_final_status = job_wait(session, job_id)
-            # Step 2.3: Validate job status. If job failed, stop processing and log error.
-            validate_job(job_id, job_final_status, fms_client, error_files_dir)
-            logging.info(
-                f"Moving input file '{file_info['filename']}' from raw files location "
-                f"to the processing location has finished (job id: '{job_id}').")
-
-            # Step 3.1: Schedule calculation job
-            ps_client = ProjectServiceClient(session, IMPAIRMENT_STUDIO_API_BASE_URL)
-            analysis_job_id = ps_client.run_analysis(analysis_id)
-            logging.info(f"Analysis calculation (job id: '{analysis_job_id}') has started.")
-
-            # Step 3.2: Wait until calculation is done
-            analysis_job_final_status = job_wait(session, analysis_job_id)
-            # Step 3.1: Validate job status. If job failed, stop processing and log error.
-            validate_job(analysis_job_id, analysis_job_final_status, fms_client, error_files_dir)
-            logging.info(f"Analysis calculation (job id: '{analysis_job_id}') has finished. ")
-
-            # Step 4: Download results
-            logging.info(f"Downloading analysis results to the folder '{result_files_dir}' has started.")
-            destination_results_file_name = \
-                f"job_{analysis_job_final_status['type']}_{analysis_job_final_status['qualifier']}_results.zip"
-            destination_results_file_path = os.path.join(result_files_dir, destination_results_file_name)
-            fms_client.download_analysis_result_file(analysis_id, destination_results_file_path)
-            logging.info(
-                f"Downloading analysis results to the file '{destination_results_file_path}' "
-                f"in the folder '{result_files_dir}' has finished.")
-            logging.info(f"Analysis run (analysis id: '{analysis_id}') has finished.")
+        with Session(USER_ID, USER_PASSWORD, SSO_SERVICE_BASE_URL, PROXIES, TRANSFER_COMPRESSION) as session:
+            try:
+                # Step 1: Upload ZIP file with inputs to the system's raw files location
+                logging.info(f"Importing of the input file '{input_zip_file_path}' to the system has started.")
+                fms_client = FileManagementServiceClient(session, DATA_API_BASE_URL)
+                head, file_management_file_name = os.path.split(input_zip_file_path)
+                with profile_stage('upload'):
+                    files_info = fms_client.import_file(input_zip_file_path, file_management_file_name, 'raw')
+                logging.info(f"Importing of the input file '{input_zip_file_path}' to the system has finished.")
+
+                # Step 2.1: Schedule a job to move files from raw files location to processing location
+                file_info = files_info[0]
+                ds_client = DictionaryServiceClient(session, DATA_API_BASE_URL)
+                with profile_stage('dictionary_import'):
+                    job_id = ds_client.import_file(file_info['id'], 'FileUpload', True)
+                logging.info(
+                    f"Moving input file '{file_info['filename']}' from raw files location "
+                    f"to the processing location has started (job id: '{job_id}').")
+
+                # Step 2.2: Wait until file moving is done
+                with profile_stage('dictionary_import_wait'):
+                    job_final_status = job_wait(session, job_id)
+                # Step 2.3: Validate job status. If job failed, stop processing and log error.
+                with profile_stage('validate_job'):
+                    validate_job(job_id, job_final_status, fms_client, error_files_dir)
+                logging.info(
+                    f"Moving input file '{file_info['filename']}' from raw files location "
+                    f"to the processing location has finished (job id: '{job_id}').")
+
+                # Step 3.1: Schedule calculation job
+                ps_client = ProjectServiceClient(session, IMPAIRMENT_STUDIO_API_BASE_URL)
+                with profile_stage('run_analysis'):
+                    analysis_job_id = ps_client.run_analysis(analysis_id)
+                logging.info(f"Analysis calculation (job id: '{analysis_job_id}') has started.")
+
+                # Step 3.2: Wait until calculation is done
+                with profile_stage('run_analysis_wait'):
+                    analysis_job_final_status = job_wait(session, analysis_job_id)
+                # Step 3.1: Validate job status. If job failed, stop processing and log error.
+                with profile_stage('validate_job'):
+                    validate_job(analysis_job_id, analysis_job_final_status, fms_client, error_files_dir)
+                logging.info(f"Analysis calculation (job id: '{analysis_job_id}') has finished. ")
+
+                # Step 4: Download results
+                logging.info(f"Downloading analysis results to the folder '{result_files_dir}' has started.")
+                destination_results_file_name = \
+                    f"job_{analysis_job_final_status['type']}_{analysis_job_final_status['qualifier']}_results.zip"
+                destination_results_file_path = os.path.join(result_files_dir, destination_results_file_name)
+                with profile_stage('download_results'):
+                    fms_client.download_analysis_result_file(analysis_id, destination_results_file_path)
+                logging.info(
+                    f"Downloading analysis results to the file '{destination_results_file_path}' "
+                    f"in the folder '{result_files_dir}' has finished.")
+                logging.info(f"Analysis run (analysis id: '{analysis_id}') has finished.")
+            finally:
+                session.transfer_statistics.log_summary()
     except Exception as e:
         logging.info(
             f"Analysis run (analysis id: '{analysis_id}') has been terminated by error: '{e}'.")
 
 
+def validate_input_file(input_zip_file_path, error_files_dir):
+    """
+    Validates the input file on the client side and writes errors to the defined directory
+    :param input_zip_file_path: Input file in ZIP format
+    :param error_files_dir: Destination directory for error files on the client side
+    """
+    logging.info(f"Validation of the input file '{input_zip_file_path}' has started.")
+    errors = validate_input_zip_file(input_zip_file_path)
+    if len(errors) > 0:
+        head, input_zip_file_name = os.path.split(input_zip_file_path)
+        destination_error_file_name = f"input_validation_{os.path.splitext(input_zip_file_name)[0]}_errors.zip"
+        destination_error_file_path = os.path.join(error_files_dir, destination_error_file_name)
+        write_error_file(errors, destination_error_file_path)
+        destination_error_file_abs_path = os.path.abspath(destination_error_file_path)
+        raise RunAnalyticsError(
+            f"The input file '{input_zip_file_path}' has failed validation with {len(errors)} errors. "
+            f"The errors are in the file '{destination_error_file_abs_path}'.")
+    logging.info(f"Validation of the input file '{input_zip_file_path}' has finished.")
+
+
 def job_wait(session, job_id, wait_timeout: timedelta = DEFAULT_JOB_WAIT_TIMEOUT):
     """
     Waits until job is complete successfully or with failures.
@@ -146,40 +187,21 @@ def validate_job(job_id, job_final_status, fms_client, error_files_dir):
     :param error_files_dir: Destination directory for error files on the client side
     """
     if is_job_failed(job_final_status):
-        destination_error_file_path = download_error_file(job_id, job_final_status, fms_client, error_files_dir)
-        destination_error_file_abs_path = os.path.abspath(destination_error_file_path)
+        error_index, error_file_paths, download_errors, parse_errors = \
+            validate_jobs({job_id: job_final_status}, fms_client, error_files_dir)
+        if job_id in download_errors:
+            errors_location = f"The error file has not been retrieved: '{download_errors[job_id]}'."
+        elif job_id in parse_errors:
+            destination_error_file_abs_path = os.path.abspath(error_file_paths[job_id])
+            errors_location = f"The error file '{destination_error_file_abs_path}' cannot be parsed: " \
+                              f"'{parse_errors[job_id]}'."
+        else:
+            destination_error_file_abs_path = os.path.abspath(error_file_paths[job_id])
+            errors_location = f"The errors are in the file '{destination_error_file_abs_path}'."
         raise RunAnalyticsError(
             f"The job 'job type: {job_final_status['type']}; job id: {job_id}' "
             f"stopped by error with status '{job_final_status['status']}'. "
-            f"The errors are in the file '{destination_error_file_abs_path}'.")
-
-
-def is_job_failed(job_status):
-    """
-    Check job status on failure
-    :param job_status: Job status to verify
-    :return: True - job has failed; False - job has finished successfully
-    """
-    job_failed_statuses = ['FAILED', 'COMPLETED_WITH_ERRORS']
-    if job_status['status'] in job_failed_statuses:
-        return True
-    return False
-
-
-def download_error_file(job_id, job_final_status, fms_client, error_files_dir):
-    """
-    Downloads error file for the failed jobs or jobs with calculation errors
-    :param job_id: Job id
-    :param job_final_status: The final status of the job
-    :param fms_client: File management service client for downloading an error file
-    :param error_files_dir: Destination directory for error files on the client side
-    :return: Destination error file path (full name of the file)
-    """
-    destination_error_file_name = f"job_{job_final_status['type']}_{job_id}_errors.zip"
-    destination_error_file_path = os.path.join(error_files_dir, destination_error_file_name)
-    fms_client.download_job_import_error_file(job_id, destination_error_file_path)
-
-    return destination_error_file_path
+            f"Errors by error code: {error_index.count_by('errorCode')}. {errors_location}")
 
 
 class RunAnalyticsError(Exception):
@@ -195,6 +217,21 @@ args_parser.add_argument('--analysis_id', help='The analysis id.')
 args_parser.add_argument('--input_zip_file', help="The name of the analysis input ZIP file.")
 args_parser.add_argument('--result_files_dir', help="The name of the results files directory.")
 args_parser.add_argument('--error_files_dir', help="The name of the error files directory.")
+args_parser.add_argument(
+    '--skip_input_validation', action='store_true',
+    help="Upload the input ZIP file without validating it on the client side.")
+args_parser.add_argument(
+    '--profile', action='store_true',
+    help="Profile the client process and log a per-stage summary of wall, CPU, blocked time and allocations.")
+args_parser.add_argument(
+    '--trace-out',
+    help="The name of the profiling trace file. It implies --profile. "
+         "Files with the '.json' extension are written in speedscope format, "
+         "other files in the collapsed stack format of flamegraph.pl. Only on-CPU samples are written.")
+args_parser.add_argument(
+    '--trace-blocked', action='store_true',
+    help="Also write samples of threads blocked in sleep, socket calls or waiting for other threads "
+         "to the profiling trace file.")
 
 # Command line interface for run analysis workflow
 if __name__ == '__main__':
@@ -204,6 +241,20 @@ if __name__ == '__main__':
     arg_input_zip_file_path = args.input_zip_file
     arg_result_files_dir = args.result_files_dir
     arg_error_files_dir = args.error_files_dir
+    arg_validate_input = not args.skip_input_validation
+
+    arg_trace_out = args.trace_out
+    arg_profile = args.profile or arg_trace_out is not None
 
     # Run analysis workflow
-    run_analytics(arg_analysis_id, arg_input_zip_file_path, arg_result_files_dir, arg_error_files_dir)
+    if arg_profile:
+        with Profiler() as profiler:
+            run_analytics(
+                arg_analysis_id, arg_input_zip_file_path, arg_result_files_dir, arg_error_files_dir,
+                arg_validate_input)
+        profiler.log_summary()
+        if arg_trace_out is not None:
+            profiler.write_trace(arg_trace_out, args.trace_blocked)
+    else:
+        run_analytics(
+            arg_analysis_id, arg_input_zip_file_path, arg_result_files_dir, arg_error_files_dir, arg_validate_input)
@@ -0,0 +1,362 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import csv
+import io
+import math
+import os
+import zipfile
+import logging
+
+
+# Layout of the client-side error report: one CSV file per input file, packed into a ZIP file.
+# It is defined by this client; the layout of the job error files of the File Management Service is not documented.
+ERROR_FILE_HEADER = ['fileName', 'rowNumber', 'columnName', 'errorCode', 'errorMessage']
+
+ERROR_CODE_MISSING_COLUMN = 'MISSING_COLUMN'
+ERROR_CODE_MALFORMED_FILE = 'MALFORMED_FILE'
+ERROR_CODE_WRONG_FIELD_COUNT = 'WRONG_FIELD_COUNT'
+ERROR_CODE_MISSING_VALUE = 'MISSING_VALUE'
+ERROR_CODE_INVALID_TYPE = 'INVALID_TYPE'
+ERROR_CODE_OUT_OF_RANGE = 'OUT_OF_RANGE'
+
+DEFAULT_CHUNK_SIZE = 10000
+DEFAULT_MAX_ERRORS = 1000
+
+
+class ColumnRule(object):
+    def __init__(self, column_type, required=False, min_value=None, max_value=None):
+        self.column_type = column_type
+        self.required = required
+        self.min_value = min_value
+        self.max_value = max_value
+
+
+def parse_string(value):
+    return value
+
+
+def parse_decimal(value):
+    result = float(value)
+    if not math.isfinite(result):
+        raise ValueError(f"Invalid decimal value '{value}'.")
+    return result
+
+
+def parse_integer(value):
+    return int(value)
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d')
+
+
+def parse_boolean(value):
+    if value.upper() not in ('TRUE', 'FALSE'):
+        raise ValueError(f"Invalid boolean value '{value}'.")
+    return value.upper() == 'TRUE'
+
+
+COLUMN_TYPE_PARSERS = {
+    'string': parse_string,
+    'decimal': parse_decimal,
+    'integer': parse_integer,
+    'date': parse_date,
+    'boolean': parse_boolean
+}
+
+# Client side rules of the input files which are known to the analysis workflow.
+# Members of the input ZIP file and columns which are not listed here are passed to the server as they are,
+# so the client side validation is never stricter than the server.
+INPUT_FILE_RULES = {
+    'instrumentCashFlow.csv': {
+        'asOfDate': ColumnRule('date', required=True),
+        'scenarioIdentifier': ColumnRule('string', required=True),
+        'portfolioIdentifier': ColumnRule('string', required=True),
+        'instrumentIdentifier': ColumnRule('string', required=True),
+        'cashFlowDate': ColumnRule('date', required=True),
+        'beginningUnpaidPrincipalBalance': ColumnRule('decimal'),
+        'principalPayment': ColumnRule('decimal'),
+        'interestPayment': ColumnRule('decimal')
+    },
+    'instrumentReference.csv': {
+        'instrumentIdentifier': ColumnRule('string', required=True),
+        'instrumentType': ColumnRule('string', required=True),
+        'description': ColumnRule('string'),
+        'company': ColumnRule('string'),
+        'instrumentSubType': ColumnRule('string'),
+        'revolving': ColumnRule('boolean'),
+        'unconditionallyCancellable': ColumnRule('boolean'),
+        'cumulativeDrawnAmount': ColumnRule('decimal'),
+        'currentCommitmentAmount': ColumnRule('decimal'),
+        'originalNotionalAmount': ColumnRule('decimal'),
+        'unpaidPrincipalBalance': ColumnRule('decimal'),
+        'undrawnCommitmentAmount': ColumnRule('decimal'),
+        'amortizedCostOverride': ColumnRule('decimal'),
+        'effectiveInterestRateInitial': ColumnRule('decimal'),
+        'useImportedCashFlow': ColumnRule('boolean'),
+        'longRunLossRateTerm': ColumnRule('decimal', min_value=0),
+        'longRunLossRate': ColumnRule('decimal', min_value=0, max_value=1),
+        'lossIdentificationPeriod': ColumnRule('decimal', min_value=0),
+        'lossRateOneYear': ColumnRule('decimal', min_value=0, max_value=1),
+        'lossRateCumulativeLifetime': ColumnRule('decimal', min_value=0, max_value=1),
+        'asOfDate': ColumnRule('date', required=True),
+        'portfolioIdentifier': ColumnRule('string', required=True),
+        'maturityDate': ColumnRule('date'),
+        'ugd': ColumnRule('decimal', min_value=0, max_value=1),
+        'ccf': ColumnRule('decimal', min_value=0, max_value=1),
+        'amortizationType': ColumnRule('string'),
+        'interestRateType': ColumnRule('string'),
+        'fixedRate': ColumnRule('decimal'),
+        'interestPaymentFrequency': ColumnRule('string'),
+        'ascImpairmentEvaluation': ColumnRule('string'),
+        'instrumentCurrency': ColumnRule('string')
+    },
+    'instrumentRiskMetric.csv': {
+        'asOfDate': ColumnRule('date', required=True),
+        'scenarioIdentifier': ColumnRule('string', required=True),
+        'instrumentIdentifier': ColumnRule('string', required=True),
+        'term': ColumnRule('decimal', required=True, min_value=0),
+        'lossRateAnnualized': ColumnRule('decimal', min_value=0, max_value=1),
+        'lossRateCumulative': ColumnRule('decimal', min_value=0, max_value=1),
+        'ead': ColumnRule('decimal'),
+        'modelName': ColumnRule('string'),
+        'modelOutput': ColumnRule('string'),
+        'ugd': ColumnRule('decimal', min_value=0, max_value=1),
+        'ccf': ColumnRule('decimal', min_value=0, max_value=1)
+    },
+    'instrumentScenario.csv': {
+        'asOfDate': ColumnRule('date', required=True),
+        'scenarioIdentifier': ColumnRule('string', required=True),
+        'portfolioIdentifier': ColumnRule('string', required=True),
+        'instrumentIdentifier': ColumnRule('string', required=True),
+        'incurredLossRateAnnualized': ColumnRule('decimal', min_value=0, max_value=1)
+    }
+}
+
+
+def validate_input_zip_file(input_zip_file_path, max_workers=None,
+                            chunk_size=DEFAULT_CHUNK_SIZE, max_errors=DEFAULT_MAX_ERRORS):
+    """
+    Validates CSV members of the input ZIP file on the client side before it is uploaded.
+    Members are validated in parallel processes; each member is streamed out of the ZIP file in chunks of rows.
+    :param input_zip_file_path: Input file in ZIP format
+    :param max_workers: Maximum number of worker processes. 1 validates members in the current process.
+    :param chunk_size: Number of rows parsed and checked at once
+    :param max_errors: Number of errors per member after which validation of the member stops
+    :return: List of errors, each one is a dictionary with ERROR_FILE_HEADER keys. Empty if input is valid.
+    """
+    with zipfile.ZipFile(input_zip_file_path) as input_zip_file:
+        member_names = [name for name in input_zip_file.namelist()
+                        if os.path.basename(name) in INPUT_FILE_RULES]
+
+    if max_workers == 1 or len(member_names) <= 1:
+        member_errors = [validate_input_zip_file_member(input_zip_file_path, member_name, chunk_size, max_errors)
+                         for member_name in member_names]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(
+                validate_input_zip_file_member, input_zip_file_path, member_name, chunk_size, max_errors)
+                for member_name in member_names]
+            member_errors = [future.result() for future in futures]
+
+    result = [error for errors in member_errors for error in errors]
+    return result
+
+
+def validate_input_zip_file_member(input_zip_file_path, member_name, chunk_size=DEFAULT_CHUNK_SIZE,
+                                   max_errors=DEFAULT_MAX_ERRORS):
+    """
+    Validates a single CSV member of the input ZIP file
+    :param input_zip_file_path: Input file in ZIP format
+    :param member_name: Name of the CSV file inside of the ZIP file
+    :param chunk_size: Number of rows parsed and checked at once
+    :param max_errors: Number of errors after which validation stops
+    :return: List of errors
+    """
+    column_rules = INPUT_FILE_RULES[os.path.basename(member_name)]
+    result = []
+
+    with zipfile.ZipFile(input_zip_file_path) as input_zip_file:
+        with input_zip_file.open(member_name) as member_file:
+            member_text_file = io.TextIOWrapper(member_file, encoding='utf-8-sig', newline='')
+            reader = csv.reader(member_text_file, strict=True)
+
+            # Row number of the header is 1
+            chunk_first_row_number = 1
+            chunk = []
+            try:
+                header = next(reader, [])
+                result.extend(validate_header(member_name, header, column_rules))
+                if len(result) > 0:
+                    return result[:max_errors]
+
+                chunk_first_row_number = 2
+                for row in reader:
+                    chunk.append(row)
+                    if len(chunk) == chunk_size:
+                        result.extend(
+                            validate_chunk(member_name, header, column_rules, chunk, chunk_first_row_number))
+                        if len(result) >= max_errors:
+                            return result[:max_errors]
+                        chunk_first_row_number += len(chunk)
+                        chunk = []
+
+                if len(chunk) > 0:
+                    result.extend(validate_chunk(member_name, header, column_rules, chunk, chunk_first_row_number))
+            except (csv.Error, UnicodeDecodeError) as e:
+                # The rest of the file cannot be read, so the rows read so far are checked and reported
+                # with the read error at the row which cannot be read
+                if len(chunk) > 0:
+                    result.extend(validate_chunk(member_name, header, column_rules, chunk, chunk_first_row_number))
+                result.append(create_error(member_name, chunk_first_row_number + len(chunk), '',
+                                           ERROR_CODE_MALFORMED_FILE, f"File cannot be read: {e}"))
+
+    return result[:max_errors]
+
+
+def validate_header(member_name, header, column_rules):
+    """
+    Validates the header of a CSV file against its column rules.
+    Unknown and duplicated columns are logged as warnings only, because the server may accept them.
+    :param member_name: Name of the CSV file
+    :param header: List of column names
+    :param column_rules: Dictionary of column rules by column name
+    :return: List of errors
+    """
+    result = []
+
+    seen_column_names = set()
+    for column_name in header:
+        if column_name in seen_column_names:
+            logging.warning(f"Column '{column_name}' of the file '{member_name}' is duplicated. "
+                            f"Only its first occurrence is validated.")
+        elif column_name not in column_rules:
+            logging.warning(f"Column '{column_name}' of the file '{member_name}' is unknown. It is not validated.")
+        seen_column_names.add(column_name)
+
+    for column_name, column_rule in column_rules.items():
+        if column_rule.required and column_name not in seen_column_names:
+            result.append(create_error(member_name, 1, column_name, ERROR_CODE_MISSING_COLUMN,
+                                       f"Required column '{column_name}' is missing."))
+
+    return result
+
+
+def validate_chunk(member_name, header, column_rules, chunk, chunk_first_row_number):
+    """
+    Validates a chunk of rows column by column, so each rule is applied to all values of a column at once
+    :param member_name: Name of the CSV file
+    :param header: List of column names
+    :param column_rules: Dictionary of column rules by column name
+    :param chunk: List of rows
+    :param chunk_first_row_number: Row number of the first row in the chunk
+    :return: List of errors ordered by row number
+    """
+    result = []
+
+    row_numbers = []
+    rows = []
+    for index, row in enumerate(chunk):
+        row_number = chunk_first_row_number + index
+        if len(row) == len(header):
+            row_numbers.append(row_number)
+            rows.append(row)
+        elif len(row) > 0:
+            result.append(create_error(member_name, row_number, '', ERROR_CODE_WRONG_FIELD_COUNT,
+                                       f"Expected {len(header)} fields, found {len(row)}."))
+
+    if len(rows) > 0:
+        columns = list(zip(*rows))
+        validated_column_names = set()
+        for column_name, column_values in zip(header, columns):
+            # Unknown columns and repeated occurrences of a column are not validated
+            if column_name not in column_rules or column_name in validated_column_names:
+                continue
+            validated_column_names.add(column_name)
+            result.extend(validate_column(member_name, column_name, column_rules[column_name],
+                                          column_values, row_numbers))
+
+    result.sort(key=lambda error: error['rowNumber'])
+    return result
+
+
+def validate_column(member_name, column_name, column_rule, column_values, row_numbers):
+    """
+    Validates the values of a single column for null, type and range rules
+    :param member_name: Name of the CSV file
+    :param column_name: Column name
+    :param column_rule: Column rule
+    :param column_values: Column values of the chunk
+    :param row_numbers: Row numbers of the column values
+    :return: List of errors
+    """
+    result = []
+
+    empty_flags = [value == '' for value in column_values]
+    if column_rule.required:
+        result.extend(create_error(member_name, row_number, column_name, ERROR_CODE_MISSING_VALUE,
+                                   f"Required value of the column '{column_name}' is missing.")
+                      for row_number, is_empty in zip(row_numbers, empty_flags) if is_empty)
+
+    if column_rule.column_type == 'string':
+        return result
+
+    parser = COLUMN_TYPE_PARSERS[column_rule.column_type]
+    parsed_values = [None if is_empty else try_parse(parser, value)
+                     for value, is_empty in zip(column_values, empty_flags)]
+
+    for row_number, value, parsed_value, is_empty in zip(row_numbers, column_values, parsed_values, empty_flags):
+        if is_empty:
+            continue
+        if parsed_value is None:
+            result.append(create_error(member_name, row_number, column_name, ERROR_CODE_INVALID_TYPE,
+                                       f"Value '{value}' is not a valid {column_rule.column_type}."))
+        elif column_rule.min_value is not None and parsed_value < column_rule.min_value:
+            result.append(create_error(member_name, row_number, column_name, ERROR_CODE_OUT_OF_RANGE,
+                                       f"Value '{value}' is less than {column_rule.min_value}."))
+        elif column_rule.max_value is not None and parsed_value > column_rule.max_value:
+            result.append(create_error(member_name, row_number, column_name, ERROR_CODE_OUT_OF_RANGE,
+                                       f"Value '{value}' is greater than {column_rule.max_value}."))
+
+    return result
+
+
+def try_parse(parser, value):
+    try:
+        result = parser(value)
+        return result
+    except ValueError:
+        return None
+
+
+def create_error(member_name, row_number, column_name, error_code, error_message):
+    result = {
+        'fileName': member_name,
+        'rowNumber': row_number,
+        'columnName': column_name,
+        'errorCode': error_code,
+        'errorMessage': error_message
+    }
+    return result
+
+
+def write_error_file(errors, destination_file_path):
+    """
+    Writes errors to a ZIP file with one CSV error file per validated input file
+    :param errors: List of errors
+    :param destination_file_path: Destination error file path (full name of the file)
+    """
+    errors_by_file_name = {}
+    for error in errors:
+        errors_by_file_name.setdefault(error['fileName'], []).append(error)
+
+    with zipfile.ZipFile(destination_file_path, 'w', zipfile.ZIP_DEFLATED) as error_zip_file:
+        for file_name, file_errors in errors_by_file_name.items():
+            error_file_content = io.StringIO()
+            writer = csv.DictWriter(error_file_content, fieldnames=ERROR_FILE_HEADER, lineterminator='\n')
+            writer.writeheader()
+            writer.writerows(file_errors)
+            error_file_name = f"{os.path.splitext(os.path.basename(file_name))[0]}_errors.csv"
+            error_zip_file.writestr(error_file_name, error_file_content.getvalue())
+
+    logging.info(f"{len(errors)} input validation errors have been written to the file '{destination_file_path}'.")
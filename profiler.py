@@ -0,0 +1,306 @@
+from contextlib import contextmanager
+import json
+import os
+import socket
+import ssl
+import sys
+import threading
+import time
+import tracemalloc
+import logging
+
+
+DEFAULT_SAMPLING_INTERVAL_IN_SECONDS = 0.005
+TOP_ALLOCATION_SITES_COUNT = 10
+NO_STAGE_NAME = 'no_stage'
+ON_CPU_FRAME_NAME = 'on-cpu'
+BLOCKED_FRAME_NAME = 'blocked'
+
+# Top frames of threads waiting for other threads, e.g. idle thread pool workers or future.result()
+WAITING_FRAMES = {
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('queue.py', 'get'),
+    ('thread.py', '_worker')
+}
+
+# tracemalloc.reset_peak() is available since Python 3.9. Before that, stage peaks are peaks since profiling start.
+TRACEMALLOC_RESET_PEAK_SUPPORTED = hasattr(tracemalloc, 'reset_peak')
+
+# Socket methods in which the client process is blocked on the network
+BLOCKING_SOCKET_METHODS = [
+    (socket.socket, 'connect'),
+    (socket.socket, 'sendall'),
+    (socket.socket, 'recv_into'),
+    (ssl.SSLSocket, 'sendall'),
+    (ssl.SSLSocket, 'recv_into'),
+    (ssl.SSLSocket, 'do_handshake')
+]
+
+# Profiler of the running analysis workflow. It is None when the workflow runs without profiling.
+active_profiler = None
+
+
+class StageStatistics(object):
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.sleep_time = 0.0
+        self.socket_time = 0.0
+        self.allocated_bytes = 0
+        self.peak_traced_bytes = 0
+
+
+class Profiler(object):
+    """
+    Low overhead profiler of the client process. It samples stacks of all threads in the background,
+    measures wall and CPU time by workflow stage, tracks allocations through tracemalloc and time blocked
+    in time.sleep() and in socket calls.
+    Samples of threads blocked in time.sleep(), in socket calls or waiting for other threads are tagged
+    as blocked, so the traces show where CPU time goes. Stage CPU time is the CPU time of the thread
+    running the stage, so the sampler thread is not charged to the stages.
+    """
+    def __init__(self, sampling_interval=DEFAULT_SAMPLING_INTERVAL_IN_SECONDS):
+        self.sampling_interval = sampling_interval
+        self.stack_samples = {}
+        self.samples_count = 0
+        self.blocked_samples_count = 0
+        self.blocked_thread_ids = {}
+        self.stage_peaks = []
+        self.stages = {}
+        self.current_stage_name = NO_STAGE_NAME
+        self.start_time = None
+        self.stop_time = None
+        self.top_allocation_sites = []
+
+        self.lock = threading.Lock()
+        self.sampler_stop_event = threading.Event()
+        self.sampler_thread = None
+        self.original_functions = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        global active_profiler
+
+        self.start_time = time.perf_counter()
+        tracemalloc.start()
+        self.patch_blocking_functions()
+
+        self.sampler_thread = threading.Thread(target=self.sample_stacks, name='profiler-sampler', daemon=True)
+        self.sampler_thread.start()
+        active_profiler = self
+
+    def stop(self):
+        global active_profiler
+
+        active_profiler = None
+        self.sampler_stop_event.set()
+        self.sampler_thread.join()
+        self.restore_blocking_functions()
+
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        self.top_allocation_sites = snapshot.statistics('lineno')[:TOP_ALLOCATION_SITES_COUNT]
+        self.stop_time = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Measures a stage of the workflow. Stack samples taken during the stage are grouped under the stage name.
+        :param name: Stage name
+        """
+        stage_statistics = self.get_stage_statistics(name)
+        previous_stage_name = self.current_stage_name
+        self.current_stage_name = name
+
+        traced_bytes_begin, peak_traced_bytes = tracemalloc.get_traced_memory()
+        if TRACEMALLOC_RESET_PEAK_SUPPORTED:
+            # Resetting the peak loses the peak of the outer stage so far, so it is saved first
+            if len(self.stage_peaks) > 0:
+                self.stage_peaks[-1] = max(self.stage_peaks[-1], peak_traced_bytes)
+            tracemalloc.reset_peak()
+        self.stage_peaks.append(traced_bytes_begin)
+        wall_time_begin = time.perf_counter()
+        cpu_time_begin = time.thread_time()
+        try:
+            yield
+        finally:
+            stage_statistics.calls += 1
+            stage_statistics.wall_time += time.perf_counter() - wall_time_begin
+            stage_statistics.cpu_time += time.thread_time() - cpu_time_begin
+            traced_bytes_end, peak_traced_bytes = tracemalloc.get_traced_memory()
+            peak_traced_bytes = max(peak_traced_bytes, self.stage_peaks.pop())
+            if len(self.stage_peaks) > 0:
+                self.stage_peaks[-1] = max(self.stage_peaks[-1], peak_traced_bytes)
+            stage_statistics.allocated_bytes += max(traced_bytes_end - traced_bytes_begin, 0)
+            stage_statistics.peak_traced_bytes = max(stage_statistics.peak_traced_bytes, peak_traced_bytes)
+            self.current_stage_name = previous_stage_name
+
+    def get_stage_statistics(self, name):
+        with self.lock:
+            if name not in self.stages:
+                self.stages[name] = StageStatistics(name)
+            return self.stages[name]
+
+    def sample_stacks(self):
+        sampler_thread_id = threading.get_ident()
+        while not self.sampler_stop_event.wait(self.sampling_interval):
+            stage_name = self.current_stage_name
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == sampler_thread_id:
+                    continue
+                is_blocked = self.is_thread_blocked(thread_id, frame)
+                stack = [f'stage {stage_name}', BLOCKED_FRAME_NAME if is_blocked else ON_CPU_FRAME_NAME]
+                stack.extend(reversed(Profiler.collect_frame_names(frame)))
+                stack = tuple(stack)
+                self.stack_samples[stack] = self.stack_samples.get(stack, 0) + 1
+                self.samples_count += 1
+                if is_blocked:
+                    self.blocked_samples_count += 1
+
+    def is_thread_blocked(self, thread_id, frame):
+        if self.blocked_thread_ids.get(thread_id, 0) > 0:
+            return True
+        result = (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in WAITING_FRAMES
+        return result
+
+    @staticmethod
+    def collect_frame_names(frame):
+        result = []
+        while frame is not None:
+            code = frame.f_code
+            result.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+            frame = frame.f_back
+        return result
+
+    def patch_blocking_functions(self):
+        self.patch_function(time, 'sleep', 'sleep_time')
+        for owner, function_name in BLOCKING_SOCKET_METHODS:
+            self.patch_function(owner, function_name, 'socket_time')
+
+    def patch_function(self, owner, function_name, statistics_attribute_name):
+        # Methods inherited from a base class are patched on the owner and removed from it on restore
+        original_function = owner.__dict__.get(function_name)
+        self.original_functions.append((owner, function_name, original_function))
+        timed_function = self.create_timed_function(getattr(owner, function_name), statistics_attribute_name)
+        setattr(owner, function_name, timed_function)
+
+    def restore_blocking_functions(self):
+        for owner, function_name, original_function in reversed(self.original_functions):
+            if original_function is None:
+                delattr(owner, function_name)
+            else:
+                setattr(owner, function_name, original_function)
+        self.original_functions = []
+
+    def create_timed_function(self, function, statistics_attribute_name):
+        profiler = self
+
+        def timed_function(*args, **kwargs):
+            thread_id = threading.get_ident()
+            profiler.blocked_thread_ids[thread_id] = profiler.blocked_thread_ids.get(thread_id, 0) + 1
+            begin = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed_time = time.perf_counter() - begin
+                profiler.blocked_thread_ids[thread_id] -= 1
+                stage_statistics = profiler.get_stage_statistics(profiler.current_stage_name)
+                with profiler.lock:
+                    setattr(stage_statistics, statistics_attribute_name,
+                            getattr(stage_statistics, statistics_attribute_name) + elapsed_time)
+
+        return timed_function
+
+    def write_trace(self, trace_file_path, include_blocked=False):
+        """
+        Writes the stack samples. Files with the '.json' extension are written in speedscope format
+        (https://www.speedscope.app), other files in the collapsed stack format of flamegraph.pl.
+        :param trace_file_path: Destination trace file path (full name of the file)
+        :param include_blocked: False - only on-CPU samples; True - also samples of blocked threads
+        """
+        stack_samples = {stack: count for stack, count in self.stack_samples.items()
+                         if include_blocked or stack[1] == ON_CPU_FRAME_NAME}
+        if trace_file_path.lower().endswith('.json'):
+            self.write_speedscope_trace(trace_file_path, stack_samples)
+        else:
+            self.write_collapsed_stacks_trace(trace_file_path, stack_samples)
+        logging.info(
+            f"Profiling trace with {sum(stack_samples.values())} samples has been written to '{trace_file_path}'.")
+
+    def write_collapsed_stacks_trace(self, trace_file_path, stack_samples):
+        with open(trace_file_path, 'w') as trace_file:
+            for stack, count in stack_samples.items():
+                trace_file.write(f"{';'.join(stack)} {count}\n")
+
+    def write_speedscope_trace(self, trace_file_path, stack_samples):
+        frames = []
+        frame_indexes = {}
+        samples = []
+        weights = []
+        for stack, count in stack_samples.items():
+            sample = []
+            for frame_name in stack:
+                if frame_name not in frame_indexes:
+                    frame_indexes[frame_name] = len(frames)
+                    frames.append({'name': frame_name})
+                sample.append(frame_indexes[frame_name])
+            samples.append(sample)
+            weights.append(count * self.sampling_interval)
+
+        trace = {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': 'impairment_studio_analytics',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': 'impairment_studio_analytics',
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': sum(weights),
+                'samples': samples,
+                'weights': weights
+            }]
+        }
+        with open(trace_file_path, 'w') as trace_file:
+            json.dump(trace, trace_file)
+
+    def log_summary(self):
+        total_wall_time = (self.stop_time or time.perf_counter()) - self.start_time
+        logging.info(
+            f"Profiling summary (total wall time: {total_wall_time:.3f}s; samples: {self.samples_count}; "
+            f"blocked samples: {self.blocked_samples_count}):")
+        if not TRACEMALLOC_RESET_PEAK_SUPPORTED:
+            logging.info("Peak memory of the stages is the peak since profiling start (Python 3.9+ is needed "
+                         "for peaks per stage).")
+        logging.info('stage\tcalls\twall_s\tcpu_s\tsleep_s\tsocket_s\tallocated_kb\tpeak_kb')
+        for stage_statistics in self.stages.values():
+            logging.info(
+                f"{stage_statistics.name}\t{stage_statistics.calls}\t{stage_statistics.wall_time:.3f}\t"
+                f"{stage_statistics.cpu_time:.3f}\t{stage_statistics.sleep_time:.3f}\t"
+                f"{stage_statistics.socket_time:.3f}\t{stage_statistics.allocated_bytes / 1024:.1f}\t"
+                f"{stage_statistics.peak_traced_bytes / 1024:.1f}")
+        for allocation_site in self.top_allocation_sites:
+            logging.info(f"Allocation site: {allocation_site}")
+
+
+@contextmanager
+def profile_stage(name):
+    """
+    Measures a stage of the workflow with the active profiler. It does nothing if profiling is off.
+    :param name: Stage name
+    """
+    if active_profiler is None:
+        yield
+        return
+
+    with active_profiler.stage(name):
+        yield
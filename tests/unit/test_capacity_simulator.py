@@ -0,0 +1,80 @@
+import pytest
+import random
+from capacity_simulator import WorkflowModel, SimulationError, create_distribution, simulate_batch
+
+
+CONSTANT_MODEL_CONFIG = {
+    'request_latency_seconds': {'constant': 1},
+    'input_file_size_bytes': {'constant': 0},
+    'result_file_size_bytes': {'constant': 0},
+    'error_file_size_bytes': {'constant': 0},
+    'dictionary_import_job_seconds': {'constant': 5},
+    'analysis_job_seconds': {'constant': 25},
+    'dictionary_import_failure_rate': 0.0,
+    'analysis_failure_rate': 0.0,
+    'auth_token_lifetime_seconds': 100000,
+    'client_base_memory_bytes': 100,
+    'workflow_memory_bytes': 10
+}
+
+
+def create_model(**overrides):
+    model_config = dict(CONSTANT_MODEL_CONFIG)
+    model_config.update(overrides)
+    return WorkflowModel(model_config)
+
+
+class TestCapacitySimulator():
+    @pytest.mark.parametrize('concurrency, expected_makespan', [
+        (1, 104),
+        (2, 52)
+    ])
+    def test_simulate_batch__constant_model(self, concurrency, expected_makespan):
+        actual = simulate_batch(create_model(), 2, concurrency, 10)
+
+        assert actual.makespan == expected_makespan
+        assert actual.succeeded_count == 2
+        assert actual.failed_count == 0
+        assert actual.requests_count('sso') == 4
+        assert actual.requests_count('file_management') == 4
+        assert actual.requests_count('dictionary') == 2
+        assert actual.requests_count('project') == 2
+        assert actual.requests_count('job') == 12
+        assert actual.peak_memory == 100 + 10 * concurrency
+
+    def test_simulate_batch__failed_dictionary_import(self):
+        actual = simulate_batch(create_model(dictionary_import_failure_rate=1.0), 3, 3, 10)
+
+        assert actual.failed_count == 3
+        assert actual.requests_count('project') == 0
+        # Upload and error file download
+        assert actual.requests_count('file_management') == 6
+
+    def test_simulate_batch__auth_token_renewal(self):
+        actual = simulate_batch(create_model(auth_token_lifetime_seconds=40), 1, 1, 10)
+        assert actual.requests_count('sso') > 2
+
+    def test_simulate_batch__server_job_slots(self):
+        actual = simulate_batch(create_model(server_job_slots=1), 2, 2, 10)
+        assert actual.makespan > 52
+
+    def test_simulate_batch__same_seed_same_result(self):
+        model = WorkflowModel()
+        first = simulate_batch(model, 20, 4, 30, seed=7)
+        second = simulate_batch(model, 20, 4, 30, seed=7)
+
+        assert first.makespan == second.makespan
+        assert first.request_times == second.request_times
+
+    def test_create_distribution__recorded_samples(self):
+        distribution = create_distribution({'samples': [1, 2, 3]})
+        rng = random.Random(0)
+        assert {distribution.sample(rng) for _ in range(100)} == {1, 2, 3}
+
+    @pytest.mark.parametrize('distribution_config', [
+        {'samples': []},
+        {'uniform': [0, 1]}
+    ])
+    def test_errors_create_distribution(self, distribution_config):
+        with pytest.raises(SimulationError):
+            create_distribution(distribution_config)
@@ -0,0 +1,149 @@
+import logging
+import pytest
+import zipfile
+from error_report import ErrorIndex, create_error_index, validate_jobs
+
+
+ERROR_FILE_CONTENT = \
+    'fileName,rowNumber,columnName,errorCode,errorMessage\n' \
+    'instrumentScenario.csv,3,asOfDate,INVALID_TYPE,Bad date\n' \
+    'instrumentScenario.csv,4,instrumentIdentifier,MISSING_VALUE,Missing\n'
+
+
+class DummyFileManagementServiceClient(object):
+    def __init__(self, failing_job_ids=(), error_file_content=ERROR_FILE_CONTENT, error_file_contents=None,
+                 not_zip_job_ids=()):
+        self.failing_job_ids = failing_job_ids
+        self.not_zip_job_ids = not_zip_job_ids
+        self.error_file_content = error_file_content
+        self.error_file_contents = error_file_contents or {}
+        self.downloaded_job_ids = []
+
+    def download_job_import_error_file(self, job_id, destination_file_path):
+        if job_id in self.failing_job_ids:
+            raise IOError(f'Error file of the job {job_id} is not available.')
+        self.downloaded_job_ids.append(job_id)
+        if job_id in self.not_zip_job_ids:
+            with open(destination_file_path, 'w') as error_file:
+                error_file.write(self.error_file_content)
+            return
+        with zipfile.ZipFile(destination_file_path, 'w') as error_zip_file:
+            error_zip_file.writestr('instrumentScenario_errors.csv',
+                                    self.error_file_contents.get(job_id, self.error_file_content))
+
+
+def create_failed_jobs(count):
+    result = {f'job_{index}': {'type': 'FileUpload', 'status': 'FAILED'} for index in range(count)}
+    return result
+
+
+class TestErrorIndex():
+    @pytest.fixture(scope='function')
+    def error_index(self, tmp_path):
+        fms_client = DummyFileManagementServiceClient()
+        result, error_file_paths, download_errors, parse_errors = \
+            create_error_index(fms_client, create_failed_jobs(4), str(tmp_path))
+        return result
+
+    def test_create_error_index(self, tmp_path):
+        fms_client = DummyFileManagementServiceClient(failing_job_ids=('job_4',))
+
+        error_index, error_file_paths, download_errors, parse_errors = \
+            create_error_index(fms_client, create_failed_jobs(5), str(tmp_path))
+
+        assert sorted(error_file_paths) == ['job_0', 'job_1', 'job_2', 'job_3']
+        assert list(download_errors) == ['job_4']
+        assert parse_errors == {}
+        assert len(error_index) == 8
+        assert error_index.count_by('errorCode') == {'INVALID_TYPE': 4, 'MISSING_VALUE': 4}
+
+    @pytest.mark.parametrize('error_file_contents, not_zip_job_ids', [
+        ({'job_1': ERROR_FILE_CONTENT.encode('utf-8') * 1000 + b'instrumentScenario.csv,5,,,\xff\n'}, ()),
+        ({'job_1': ERROR_FILE_CONTENT * 1000 + 'instrumentScenario.csv,5,asOfDate,INVALID_TYPE,"Bad\n'}, ()),
+        ({}, ('job_1',))
+    ])
+    def test_create_error_index__unparsable_error_file(self, tmp_path, error_file_contents, not_zip_job_ids):
+        fms_client = DummyFileManagementServiceClient(error_file_contents=error_file_contents,
+                                                      not_zip_job_ids=not_zip_job_ids)
+
+        error_index, error_file_paths, download_errors, parse_errors = \
+            create_error_index(fms_client, create_failed_jobs(2), str(tmp_path))
+
+        assert sorted(error_file_paths) == ['job_0', 'job_1']
+        assert download_errors == {}
+        assert list(parse_errors) == ['job_1']
+        assert error_index.count_by('jobId') == {'job_0': 2}
+
+    @pytest.mark.parametrize('criteria, expected_count', [
+        ({}, 8),
+        ({'job_id': 'job_1'}, 2),
+        ({'job_id': 'job_1', 'error_code': 'MISSING_VALUE'}, 1),
+        ({'file_name': 'instrumentScenario.csv', 'row_number': 3}, 4),
+        ({'job_id': 'job_4'}, 0),
+        ({'error_code': 'UNKNOWN'}, 0)
+    ])
+    def test_query(self, error_index, criteria, expected_count):
+        actual = error_index.query(**criteria)
+        assert len(actual) == expected_count
+
+    def test_query__keeps_raw_fields(self, error_index):
+        actual = error_index.query(job_id='job_0', row_number=3)
+        assert actual[0]['fields']['errorMessage'] == 'Bad date'
+
+    def test_add_error_file__unknown_layout(self, tmp_path, caplog):
+        error_file_path = str(tmp_path / 'errors.zip')
+        with zipfile.ZipFile(error_file_path, 'w') as error_zip_file:
+            error_zip_file.writestr('errors.csv', 'Line,Reason\n7,Bad value\n')
+        target = ErrorIndex()
+
+        with caplog.at_level(logging.WARNING):
+            target.add_error_file('job_0', error_file_path)
+
+        actual = target.query(job_id='job_0')
+        assert actual[0]['rowNumber'] == 7
+        assert actual[0]['errorCode'] is None
+        assert actual[0]['fields'] == {'Line': '7', 'Reason': 'Bad value'}
+        assert 'errorCode' in caplog.text
+
+    def test_add_error_file__custom_column_mapping(self, tmp_path):
+        error_file_path = str(tmp_path / 'errors.zip')
+        with zipfile.ZipFile(error_file_path, 'w') as error_zip_file:
+            error_zip_file.writestr('errors.csv', 'Line,Reason\n7,BAD_VALUE\n')
+        target = ErrorIndex({'rowNumber': ['Line'], 'errorCode': ['Reason']})
+
+        target.add_error_file('job_0', error_file_path)
+
+        assert target.count_by('errorCode') == {'BAD_VALUE': 1}
+        assert target.errors[0]['fileName'] == 'errors.csv'
+
+
+class TestValidateJobs():
+    def test_validate_jobs(self, tmp_path, caplog):
+        job_final_statuses = create_failed_jobs(3)
+        job_final_statuses['job_ok'] = {'type': 'FileUpload', 'status': 'COMPLETED'}
+        job_final_statuses['job_2']['status'] = 'COMPLETED_WITH_ERRORS'
+        fms_client = DummyFileManagementServiceClient(failing_job_ids=('job_1',))
+
+        with caplog.at_level(logging.INFO):
+            error_index, error_file_paths, download_errors, parse_errors = \
+                validate_jobs(job_final_statuses, fms_client, str(tmp_path))
+
+        assert sorted(fms_client.downloaded_job_ids) == ['job_0', 'job_2']
+        assert sorted(error_file_paths) == ['job_0', 'job_2']
+        assert list(download_errors) == ['job_1']
+        assert error_index.count_by('jobId') == {'job_0': 2, 'job_2': 2}
+        assert "Error code 'INVALID_TYPE': 2 errors." in caplog.text
+        assert 'Error files of 1 failed jobs have not been retrieved.' in caplog.text
+
+    def test_validate_jobs__no_failed_jobs(self, tmp_path):
+        job_final_statuses = {'job_ok': {'type': 'FileUpload', 'status': 'COMPLETED'}}
+        fms_client = DummyFileManagementServiceClient()
+
+        error_index, error_file_paths, download_errors, parse_errors = \
+            validate_jobs(job_final_statuses, fms_client, str(tmp_path))
+
+        assert len(error_index) == 0
+        assert error_file_paths == {}
+        assert download_errors == {}
+        assert parse_errors == {}
+        assert fms_client.downloaded_job_ids == []
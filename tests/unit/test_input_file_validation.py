@@ -0,0 +1,105 @@
+import pytest
+import zipfile
+import input_file_validation
+from input_file_validation import validate_input_zip_file, validate_input_zip_file_member, write_error_file
+
+
+LOSS_RATE_INPUT_ZIP_FILE_PATH = '../../input_files/LossRate.zip'
+
+
+def create_input_zip_file(path, members):
+    with zipfile.ZipFile(path, 'w') as input_zip_file:
+        for member_name, member_content in members.items():
+            input_zip_file.writestr(member_name, member_content)
+    return str(path)
+
+
+class TestInputFileValidation():
+    @pytest.mark.parametrize('max_workers', [1, 2])
+    def test_validate_input_zip_file__sample_input(self, max_workers):
+        actual = validate_input_zip_file(LOSS_RATE_INPUT_ZIP_FILE_PATH, max_workers=max_workers)
+        assert actual == []
+
+    @pytest.mark.parametrize('content, expected_error_codes', [
+        ('scenarioIdentifier,portfolioIdentifier,instrumentIdentifier,incurredLossRateAnnualized\n'
+         '0,Case 01,101,0.2\n',
+         ['MISSING_COLUMN']),
+        ('asOfDate,scenarioIdentifier,portfolioIdentifier,instrumentIdentifier,incurredLossRateAnnualized,extra\n'
+         '2016-05-30,0,Case 01,101,0.2,not validated\n',
+         []),
+        ('asOfDate,scenarioIdentifier,portfolioIdentifier,instrumentIdentifier,incurredLossRateAnnualized,asOfDate\n'
+         '2016-05-30,0,Case 01,101,0.2,not validated\n',
+         []),
+        ('asOfDate,scenarioIdentifier,portfolioIdentifier,instrumentIdentifier,incurredLossRateAnnualized\n'
+         '2016-05-30,0,Case 01,101,0.2\n'
+         '2016-05-30,0,"Case 01,101,0.2\n',
+         ['MALFORMED_FILE']),
+        ('asOfDate,scenarioIdentifier,portfolioIdentifier,instrumentIdentifier,incurredLossRateAnnualized\n'
+         '2016-05-30,0,Case 01,101,0.2\n'
+         '2016-05-30,0,Case 01,,0.2\n'
+         '2016-13-30,0,Case 01,101,0.2\n'
+         '2016-05-30,0,Case 01,101,abc\n'
+         '2016-05-30,0,Case 01,101,1.5\n'
+         '2016-05-30,0,Case 01,101,NaN\n'
+         '2016-05-30,0,Case 01\n',
+         ['MISSING_VALUE', 'INVALID_TYPE', 'INVALID_TYPE', 'OUT_OF_RANGE', 'INVALID_TYPE', 'WRONG_FIELD_COUNT'])
+    ])
+    def test_validate_input_zip_file_member(self, tmp_path, content, expected_error_codes):
+        input_zip_file_path = create_input_zip_file(tmp_path / 'input.zip', {'instrumentScenario.csv': content})
+
+        actual = validate_input_zip_file_member(input_zip_file_path, 'instrumentScenario.csv', chunk_size=2)
+
+        assert [error['errorCode'] for error in actual] == expected_error_codes
+        assert all(error['fileName'] == 'instrumentScenario.csv' for error in actual)
+
+    def test_validate_input_zip_file_member__row_numbers_and_max_errors(self, tmp_path):
+        content = 'asOfDate,scenarioIdentifier,portfolioIdentifier,instrumentIdentifier,' \
+                  'incurredLossRateAnnualized\n' + '2016-05-30,0,Case 01,101,abc\n' * 5
+        input_zip_file_path = create_input_zip_file(tmp_path / 'input.zip', {'instrumentScenario.csv': content})
+
+        actual = validate_input_zip_file_member(input_zip_file_path, 'instrumentScenario.csv', chunk_size=2,
+                                                max_errors=3)
+
+        assert [error['rowNumber'] for error in actual] == [2, 3, 4]
+
+    @pytest.mark.parametrize('chunk_size', [1, 2, 10000])
+    def test_validate_input_zip_file_member__errors_before_malformed_row(self, tmp_path, chunk_size):
+        content = 'asOfDate,scenarioIdentifier,portfolioIdentifier,instrumentIdentifier,' \
+                  'incurredLossRateAnnualized\n' \
+                  '2016-05-30,0,Case 01,101,5\n' \
+                  '2016-05-30,0,"Case\n01",101,0.2\n' \
+                  '2016-05-30,0,"Case 01,101,0.2\n'
+        input_zip_file_path = create_input_zip_file(tmp_path / 'input.zip', {'instrumentScenario.csv': content})
+
+        actual = validate_input_zip_file_member(input_zip_file_path, 'instrumentScenario.csv', chunk_size=chunk_size)
+
+        assert [(error['rowNumber'], error['errorCode']) for error in actual] == \
+            [(2, 'OUT_OF_RANGE'), (4, 'MALFORMED_FILE')]
+
+    def test_validate_input_zip_file_member__encoding_error(self, tmp_path):
+        content = b'asOfDate,scenarioIdentifier,portfolioIdentifier,instrumentIdentifier\n' \
+                  b'2016-05-30,0,Case \xff,101\n'
+        input_zip_file_path = create_input_zip_file(tmp_path / 'input.zip', {'instrumentScenario.csv': content})
+
+        actual = validate_input_zip_file_member(input_zip_file_path, 'instrumentScenario.csv')
+
+        assert [error['errorCode'] for error in actual] == ['MALFORMED_FILE']
+
+    def test_validate_input_zip_file__unknown_members_are_skipped(self, tmp_path):
+        input_zip_file_path = create_input_zip_file(tmp_path / 'input.zip', {'unknown.csv': 'a,b\n1\n'})
+
+        actual = validate_input_zip_file(input_zip_file_path)
+
+        assert actual == []
+
+    def test_write_error_file(self, tmp_path):
+        errors = [input_file_validation.create_error('instrumentScenario.csv', 3, 'asOfDate', 'INVALID_TYPE', 'Bad')]
+        destination_file_path = tmp_path / 'errors.zip'
+
+        write_error_file(errors, destination_file_path)
+
+        with zipfile.ZipFile(destination_file_path) as error_zip_file:
+            assert error_zip_file.namelist() == ['instrumentScenario_errors.csv']
+            content = error_zip_file.read('instrumentScenario_errors.csv').decode('utf-8')
+        assert content == 'fileName,rowNumber,columnName,errorCode,errorMessage\n' \
+                          'instrumentScenario.csv,3,asOfDate,INVALID_TYPE,Bad\n'
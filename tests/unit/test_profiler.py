@@ -0,0 +1,91 @@
+import json
+import pytest
+import socket
+import time
+import profiler
+from profiler import Profiler, profile_stage
+
+
+def busy_work(duration):
+    end_time = time.perf_counter() + duration
+    result = 0
+    while time.perf_counter() < end_time:
+        result += sum(range(100))
+    return result
+
+
+class TestProfiler():
+    def test_stage_statistics(self):
+        original_sleep = time.sleep
+
+        with Profiler(sampling_interval=0.001) as target:
+            assert profiler.active_profiler is target
+            with profile_stage('cpu'):
+                busy_work(0.05)
+            with profile_stage('sleep'):
+                time.sleep(0.05)
+                _ = [bytearray(1024) for index in range(100)]
+
+        assert profiler.active_profiler is None
+        assert time.sleep is original_sleep
+        assert 'connect' not in socket.socket.__dict__
+
+        assert target.stages['cpu'].calls == 1
+        assert target.stages['cpu'].cpu_time > 0.02
+        assert target.stages['sleep'].sleep_time >= 0.05
+        assert target.stages['sleep'].allocated_bytes >= 100 * 1024
+        assert target.samples_count > 0
+        assert any(stack[:2] == ('stage cpu', 'on-cpu') for stack in target.stack_samples)
+        assert any(stack[:2] == ('stage sleep', 'blocked') for stack in target.stack_samples)
+        assert target.blocked_samples_count > 0
+
+    def test_stage_cpu_time__excludes_other_threads(self):
+        with Profiler(sampling_interval=0.001) as target:
+            with profile_stage('sleep'):
+                time.sleep(0.1)
+
+        assert target.stages['sleep'].cpu_time < 0.05
+
+    @pytest.mark.parametrize('reset_peak_supported', [True, False])
+    def test_stage_peak__nested_stage_keeps_outer_peak(self, monkeypatch, reset_peak_supported):
+        monkeypatch.setattr(profiler, 'TRACEMALLOC_RESET_PEAK_SUPPORTED', reset_peak_supported)
+
+        with Profiler(sampling_interval=0.01) as target:
+            with profile_stage('outer'):
+                data = bytearray(10 * 1024 * 1024)
+                del data
+                with profile_stage('inner'):
+                    pass
+
+        assert target.stages['outer'].peak_traced_bytes >= 10 * 1024 * 1024
+        if reset_peak_supported:
+            assert target.stages['inner'].peak_traced_bytes < 10 * 1024 * 1024
+
+    def test_profile_stage__without_profiler(self):
+        with profile_stage('no_profiler'):
+            pass
+
+    def test_write_trace(self, tmp_path):
+        with Profiler(sampling_interval=0.001) as target:
+            with profile_stage('cpu'):
+                busy_work(0.02)
+
+        collapsed_stacks_file_path = str(tmp_path / 'trace.folded')
+        target.write_trace(collapsed_stacks_file_path)
+        with open(collapsed_stacks_file_path) as collapsed_stacks_file:
+            lines = collapsed_stacks_file.read().splitlines()
+        assert sum(int(line.rsplit(' ', 1)[1]) for line in lines) == \
+            target.samples_count - target.blocked_samples_count
+        assert all(line.split(';')[1] == 'on-cpu' for line in lines)
+
+        target.write_trace(collapsed_stacks_file_path, include_blocked=True)
+        with open(collapsed_stacks_file_path) as collapsed_stacks_file:
+            lines = collapsed_stacks_file.read().splitlines()
+        assert sum(int(line.rsplit(' ', 1)[1]) for line in lines) == target.samples_count
+
+        speedscope_file_path = str(tmp_path / 'trace.speedscope.json')
+        target.write_trace(speedscope_file_path)
+        with open(speedscope_file_path) as speedscope_file:
+            trace = json.load(speedscope_file)
+        assert trace['profiles'][0]['type'] == 'sampled'
+        assert len(trace['profiles'][0]['samples']) == len(trace['profiles'][0]['weights'])
@@ -0,0 +1,155 @@
+import gzip
+import http.server
+import os
+import pytest
+import requests
+import threading
+import zipfile
+import zlib
+from api_client.transfer_compression import TransferStatistics, count_upload_file, is_weakly_compressed, \
+    prepare_upload_file, read_content, read_json, write_content, zstandard
+
+
+class DummyRaw(object):
+    def __init__(self, wire_content):
+        self.wire_content = wire_content
+
+    def stream(self, chunk_size, decode_content):
+        assert not decode_content
+        for begin in range(0, len(self.wire_content), chunk_size):
+            yield self.wire_content[begin:begin + chunk_size]
+
+
+class DummyResponse(object):
+    def __init__(self, wire_content, headers=None):
+        self.headers = headers or {}
+        self.raw = DummyRaw(wire_content)
+
+
+class ChunkedGzipRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    content = b'[' + b','.join([b'{"status": "COMPLETED"}'] * 10000) + b']'
+
+    def do_GET(self):
+        wire_content = gzip.compress(self.content)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for begin in range(0, len(wire_content), 1000):
+            chunk = wire_content[begin:begin + 1000]
+            self.wfile.write(f'{len(chunk):x}\r\n'.encode() + chunk + b'\r\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope='function')
+def chunked_gzip_server_url():
+    server = http.server.HTTPServer(('127.0.0.1', 0), ChunkedGzipRequestHandler)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    yield f'http://127.0.0.1:{server.server_port}/'
+    server.shutdown()
+    server.server_close()
+
+
+def create_zip_file(path, compression):
+    with zipfile.ZipFile(path, 'w', compression) as zip_file:
+        zip_file.writestr('instrumentScenario.csv', 'asOfDate,scenarioIdentifier\n' + '2016-05-30,0\n' * 1000)
+    return str(path)
+
+
+class TestTransferCompression():
+    def test_read_json(self):
+        content = b'{"status": "COMPLETED"}'
+        transfer_statistics = TransferStatistics()
+
+        actual = read_json(DummyResponse(content), transfer_statistics)
+
+        assert actual == {'status': 'COMPLETED'}
+        assert transfer_statistics.responses_count == 1
+        assert transfer_statistics.wire_bytes_received == len(content)
+        assert transfer_statistics.decoded_bytes_received == len(content)
+
+    @pytest.mark.parametrize('content_encoding, compress', [
+        ('gzip', gzip.compress),
+        ('deflate', zlib.compress),
+        ('deflate', lambda content: zlib.compress(content)[2:-4]),
+        pytest.param('zstd', lambda content: zstandard.ZstdCompressor().compress(content),
+                     marks=pytest.mark.skipif(zstandard is None, reason='zstandard is not installed'))
+    ])
+    def test_write_content(self, tmp_path, content_encoding, compress):
+        content = b'0123456789' * 300000
+        wire_content = compress(content)
+        transfer_statistics = TransferStatistics()
+        destination_file_path = tmp_path / 'result.zip'
+
+        write_content(DummyResponse(wire_content, {'Content-Encoding': content_encoding}),
+                      str(destination_file_path), transfer_statistics)
+
+        assert destination_file_path.read_bytes() == content
+        assert transfer_statistics.wire_bytes_received == len(wire_content)
+        assert transfer_statistics.decoded_bytes_received == len(content)
+
+    def test_read_content__unsupported_encoding(self):
+        with pytest.raises(requests.exceptions.ContentDecodingError):
+            read_content(DummyResponse(b'content', {'Content-Encoding': 'br'}), TransferStatistics())
+
+    def test_read_json__chunked_gzip_response(self, chunked_gzip_server_url):
+        transfer_statistics = TransferStatistics()
+
+        response = requests.get(chunked_gzip_server_url, headers={'Accept-Encoding': 'gzip'}, stream=True)
+        actual = read_json(response, transfer_statistics)
+
+        content = ChunkedGzipRequestHandler.content
+        assert actual == [{'status': 'COMPLETED'}] * 10000
+        assert transfer_statistics.wire_bytes_received == len(gzip.compress(content))
+        assert transfer_statistics.decoded_bytes_received == len(content)
+
+    @pytest.mark.parametrize('compression, expected', [
+        (zipfile.ZIP_STORED, True),
+        (zipfile.ZIP_DEFLATED, False)
+    ])
+    def test_is_weakly_compressed(self, tmp_path, compression, expected):
+        zip_file_path = create_zip_file(tmp_path / 'input.zip', compression)
+        assert is_weakly_compressed(zip_file_path) == expected
+
+    def test_count_upload_file(self, tmp_path):
+        source_file_path = create_zip_file(tmp_path / 'input.zip', zipfile.ZIP_STORED)
+        transfer_statistics = TransferStatistics()
+
+        actual = count_upload_file(source_file_path, transfer_statistics)
+
+        assert actual == (source_file_path, False)
+        assert transfer_statistics.bytes_sent == os.path.getsize(source_file_path)
+        assert transfer_statistics.original_bytes_to_send == os.path.getsize(source_file_path)
+
+    def test_prepare_upload_file__recompresses_stored_zip_file(self, tmp_path):
+        source_file_path = create_zip_file(tmp_path / 'input.zip', zipfile.ZIP_STORED)
+        transfer_statistics = TransferStatistics()
+
+        upload_file_path, is_temporary_upload_file = prepare_upload_file(source_file_path, transfer_statistics)
+
+        assert is_temporary_upload_file
+        assert transfer_statistics.bytes_sent < transfer_statistics.original_bytes_to_send
+        with zipfile.ZipFile(source_file_path) as source_zip_file, zipfile.ZipFile(upload_file_path) as upload_zip_file:
+            assert upload_zip_file.namelist() == source_zip_file.namelist()
+            assert upload_zip_file.read('instrumentScenario.csv') == source_zip_file.read('instrumentScenario.csv')
+            source_info = source_zip_file.getinfo('instrumentScenario.csv')
+            upload_info = upload_zip_file.getinfo('instrumentScenario.csv')
+            assert upload_info.date_time == source_info.date_time
+            assert upload_info.external_attr == source_info.external_attr
+            assert upload_info.compress_type == zipfile.ZIP_DEFLATED
+        os.remove(upload_file_path)
+
+    def test_prepare_upload_file__keeps_compressed_zip_file(self):
+        source_file_path = '../../input_files/LossRate.zip'
+        transfer_statistics = TransferStatistics()
+
+        actual = prepare_upload_file(source_file_path, transfer_statistics)
+
+        assert actual == (source_file_path, False)
+        assert transfer_statistics.bytes_sent == transfer_statistics.original_bytes_to_send